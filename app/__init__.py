@@ -20,14 +20,20 @@
 # Optional MYSQL and 'flask_mysql' module for click counter
 #####
 
-import inspect
 import io
+import json
 import os
 import pathlib
+import re
 import traceback
+import tracemalloc
 from datetime import datetime
 
 import flask
+from base_patcher import Assemble
+from buffers import STATS as BUFFER_STATS
+from cache import FirmwareStore, OffsetCache, OutputCache, OutputKey, SourceDigest
+from fingerprint import Fingerprint, FingerprintDB
 from mi_patcher import MiPatcher
 from nb_patcher import NbPatcher
 from util import SignatureException
@@ -48,6 +54,45 @@ try:
 except Exception as ex:
     print(ex.msg)
 
+# peak memory per request in X-Buffer-Stats, tracing slows down every allocation
+if app.config.get('TRACE_MEMORY') and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# signature offsets, patched outputs and uploads are only kept on disk when configured (see privacy.html)
+offset_cache = None
+if app.config.get('OFFSET_CACHE'):
+    try:
+        offset_cache = OffsetCache(app.config['OFFSET_CACHE'])
+    except Exception as ex:
+        print("Exception opening offset cache:", ex)
+
+output_cache = None
+# everything patch() and the routes run, cached outputs of older code are never served
+code_version = SourceDigest(sorted(pwd.glob('*.py')) + [pwd / 'app' / '__init__.py'])
+if app.config.get('OUTPUT_CACHE'):
+    try:
+        output_cache = OutputCache(app.config['OUTPUT_CACHE'])
+    except Exception as ex:
+        print("Exception opening output cache:", ex)
+
+fingerprint_db = None
+try:
+    fingerprint_db = FingerprintDB(app.config.get('FINGERPRINT_DB', pwd / 'fingerprints.db'))
+except Exception as ex:
+    print("Exception opening fingerprint database:", ex)
+
+DIGEST = re.compile('[0-9a-f]{64}')
+# uploads a session may reference by hash, kept in its cookie (see session_firmware)
+SESSION_FIRMWARE = 10
+firmware_store = None
+if app.config.get('FIRMWARE_STORE'):
+    try:
+        firmware_store = FirmwareStore(app.config['FIRMWARE_STORE'])
+    except Exception as ex:
+        print("Exception opening firmware store:", ex)
+    if not app.config.get('SECRET_KEY'):
+        app.config['SECRET_KEY'] = os.urandom(32)
+
 git_info = {
     'sha': '',
     'date': '',
@@ -91,6 +136,36 @@ def handle_bad_request(e):
             400, {'Content-Type': 'text/plain'}
 
 
+@app.before_request
+def reset_buffer_stats():
+    BUFFER_STATS.reset()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        flask.g.traced = tracemalloc.get_traced_memory()[0]
+
+
+@app.after_request
+def add_patch_stats(response):
+    # a streamed body is produced after the headers went out, its copies would not be counted
+    if not flask.g.get('streamed'):
+        stats = f'copies={BUFFER_STATS.copies}, copied={BUFFER_STATS.copied}, largest={BUFFER_STATS.largest}'
+        if tracemalloc.is_tracing():
+            stats += f', peak={tracemalloc.get_traced_memory()[1] - flask.g.get("traced", 0)}'
+        response.headers['X-Buffer-Stats'] = stats
+    results = flask.g.get('patch_results')
+    if results:
+        response.headers['X-Patch-Results'] = json.dumps(results)
+    output = flask.g.get('output_cache')
+    if output is not None:
+        response.headers['X-Output-Cache'] = output
+    stats = flask.g.get('find_stats')
+    if stats is not None:
+        response.headers['X-Find-Cache'] = 'hits={hits}, misses={misses}'.format(**stats)
+        info = Assemble.cache_info()
+        response.headers['X-Asm-Cache'] = f'hits={info.hits}, misses={info.misses}, size={info.currsize}'
+    return response
+
+
 # http://flask.pocoo.org/snippets/40/
 @app.context_processor
 def override_url_for():
@@ -148,7 +223,9 @@ def home():
 
 @app.route('/privacy')
 def privacy():
-    return flask.render_template('privacy.html')
+    return flask.render_template('privacy.html', stores_firmware=firmware_store is not None,
+                                 stores_outputs=output_cache is not None,
+                                 stores_offsets=offset_cache is not None)
 
 
 @app.route('/disclaimer')
@@ -156,38 +233,40 @@ def disclaimer():
     return flask.render_template('disclaimer.html')
 
 
-def patch(data):
-    res = []
+MI_DEVICES = ["1s", "pro2", "lite", "mi3", "4pro"]
+NB_DEVICES = ["f2pro", "f2plus", "f2", "g2", "4plus", "4max", "zt3pro", "g3", "f3pro", "gt3"]
+
+
+def patch_jobs():
+    jobs = []
+
+    def add(title, mod, *args, **kwargs):
+        jobs.append((title, mod, args, kwargs))
 
-    is_nb = False
     device = flask.request.form.get('device')
-    if device in ["1s", "pro2", "lite", "mi3", "4pro"]:
-        patcher = MiPatcher(data, device)
-    elif device in ["f2pro", "f2plus", "f2", "g2", "4plus", "4max", "zt3pro", "g3", "f3pro", "gt3"]:
-        patcher = NbPatcher(data, device)
-        is_nb = True
+    is_nb = device in NB_DEVICES
 
     embed_rand_code = flask.request.form.get('embed_rand_code', None)
     embed_rand_code = embed_rand_code.strip() if embed_rand_code is not None else None
     if embed_rand_code:
-        res.append(('EMBED_RAND_CODE', patcher.embed_rand_code(embed_rand_code)))
+        add('EMBED_RAND_CODE', 'embed_rand_code', embed_rand_code)
 
     embed_enc_key = flask.request.form.get('embed_enc_key', None)
     embed_enc_key = embed_enc_key.strip() if embed_enc_key is not None else None
     if embed_enc_key:
-        res.append(('EMBED_ENC_KEY', patcher.embed_enc_key(embed_enc_key)))
+        add('EMBED_ENC_KEY', 'embed_enc_key', embed_enc_key)
 
     us_region_spoof = flask.request.form.get('us_region_spoof', None)
     if us_region_spoof is not None:
-        res.append(("US Region Spoof", patcher.us_region_spoof()))
+        add("US Region Spoof", 'us_region_spoof')
 
     allow_sn_change = flask.request.form.get('allow_sn_change', None)
     if allow_sn_change is not None:
-        res.append(("Allow SN Change", patcher.allow_sn_change()))
+        add("Allow SN Change", 'allow_sn_change')
 
     dpc = flask.request.form.get('dpc', None)
     if dpc is not None:
-        res.append(("DPC", patcher.dpc()))
+        add("DPC", 'dpc')
 
     sl_sport = flask.request.form.get('sl_sport', None)
     sl_drive = flask.request.form.get('sl_drive', None)
@@ -200,43 +279,41 @@ def patch(data):
             assert sl_drive >= 0 and sl_drive <= 65, sl_drive
             sl_ped = int(sl_ped)
             assert sl_ped >= 0 and sl_ped <= 65, sl_ped
-            res.append((f"Speed-Limits: {sl_sport}, {sl_drive}, {sl_ped} km/h",
-                        patcher.speed_params(
-                            sl_sport, sl_drive, sl_ped
-                        )))
+            add(f"Speed-Limits: {sl_sport}, {sl_drive}, {sl_ped} km/h",
+                'speed_params', sl_sport, sl_drive, sl_ped)
     else:
         if sl_sport is not None:
             sl_sport = int(sl_sport)
             assert sl_sport >= 0 and sl_sport <= 65, sl_sport
-            res.append((f"Speed-Limit Sport: {sl_sport}km/h", patcher.speed_limit_sport(sl_sport)))
+            add(f"Speed-Limit Sport: {sl_sport}km/h", 'speed_limit_sport', sl_sport)
 
         if sl_drive is not None:
             sl_drive = int(sl_drive)
             assert sl_drive >= 0 and sl_drive <= 65, sl_drive
-            res.append((f"Speed-Limit Drive: {sl_drive}km/h", patcher.speed_limit_drive(sl_drive)))
+            add(f"Speed-Limit Drive: {sl_drive}km/h", 'speed_limit_drive', sl_drive)
 
         if sl_ped is not None:
             sl_ped = int(sl_ped)
             assert sl_ped >= 0 and sl_ped <= 65, sl_ped
-            res.append((f"Speed-Limit Pedestrian: {sl_ped}km/h", patcher.speed_limit_ped(sl_ped)))
+            add(f"Speed-Limit Pedestrian: {sl_ped}km/h", 'speed_limit_ped', sl_ped)
 
     amps_sport = flask.request.form.get('amps_sport', None)
     if amps_sport is not None:
         amps_sport = int(amps_sport)
         assert amps_sport >= 5000 and amps_sport <= 45000, amps_sport
-        res.append((f"Current Sport: {amps_sport}mA", patcher.ampere_sport(amps_sport)))
+        add(f"Current Sport: {amps_sport}mA", 'ampere_sport', amps_sport)
 
     amps_drive = flask.request.form.get('amps_drive', None)
     if amps_drive is not None:
         amps_drive = int(amps_drive)
         assert amps_drive >= 5000 and amps_drive <= 45000, amps_drive
-        res.append((f"Current Drive: {amps_drive}mA", patcher.ampere_drive(amps_drive)))
+        add(f"Current Drive: {amps_drive}mA", 'ampere_drive', amps_drive)
 
     amps_ped = flask.request.form.get('amps_ped', None)
     if amps_ped is not None:
         amps_ped = int(amps_ped)
         assert amps_ped >= 5000 and amps_ped <= 45000, amps_ped
-        res.append((f"Current Pedestrian/Eco: {amps_ped}mA", patcher.ampere_ped(amps_ped)))
+        add(f"Current Pedestrian/Eco: {amps_ped}mA", 'ampere_ped', amps_ped)
 
     amps_sport_max = flask.request.form.get('amps_sport_max', None)
     amps_drive_max = flask.request.form.get('amps_drive_max', None)
@@ -254,47 +331,44 @@ def patch(data):
                 else:
                     amps_drive_max = amps_sport_max
                 assert amps_drive_max >= 5000 and amps_drive_max <= 90000, amps_drive_max
-            res.append((f"Max-Currents Pedestrian/Drive/Sport: {amps_ped_max}mA/{amps_drive_max}mA/{amps_sport_max}mA",
-                        patcher.ampere_max(amps_ped_max, amps_drive_max, amps_sport_max)))
+            add(f"Max-Currents Pedestrian/Drive/Sport: {amps_ped_max}mA/{amps_drive_max}mA/{amps_sport_max}mA",
+                'ampere_max', amps_ped_max, amps_drive_max, amps_sport_max)
         else:
-            res.append((f"Max-Current Eco: {amps_ped_max}mA", patcher.ampere_max_eco(amps_ped_max)))
+            add(f"Max-Current Eco: {amps_ped_max}mA", 'ampere_max_eco', amps_ped_max)
     
     if is_nb:
         if amps_drive_max is not None:
             amps_drive_max = int(amps_drive_max)
             assert amps_drive_max >= 5000 and amps_drive_max <= 90000, amps_drive_max
-            res.append((f"Max-Current Drive: {amps_drive_max}mA", patcher.ampere_max_drive(amps_drive_max)))
+            add(f"Max-Current Drive: {amps_drive_max}mA", 'ampere_max_drive', amps_drive_max)
         if amps_sport_max is not None:
             amps_sport_max = int(amps_sport_max)
             assert amps_sport_max >= 5000 and amps_sport_max <= 90000, amps_sport_max
-            res.append((f"Max-Current Sport (Acc=2): {amps_sport_max}mA", patcher.ampere_max_sport(amps_sport_max)))
+            add(f"Max-Current Sport (Acc=2): {amps_sport_max}mA", 'ampere_max_sport', amps_sport_max)
 
     amps_brake_max = flask.request.form.get('amps_brake_max', None)
     if amps_brake_max is not None:
         amps_brake_max = int(amps_brake_max)
         assert amps_brake_max >= 5000 and amps_brake_max <= 65000, amps_brake_max
-        res.append((f"Max-Current Brake: {amps_brake_max}mA",
-                    patcher.ampere_brake(max_=amps_brake_max)))
+        add(f"Max-Current Brake: {amps_brake_max}mA", 'ampere_brake', max_=amps_brake_max)
 
     amps_brake_min = flask.request.form.get('amps_brake_min', None)
     if amps_brake_min is not None:
         amps_brake_min = int(amps_brake_min)
         assert amps_brake_min >= 0 and amps_brake_min <= 65000, amps_brake_min
-        res.append((f"Min-Current Brake: {amps_brake_min}mA",
-                    patcher.ampere_brake(min_=amps_brake_min)))
+        add(f"Min-Current Brake: {amps_brake_min}mA", 'ampere_brake', min_=amps_brake_min)
 
     crc = flask.request.form.get('crc', None)
     if crc is not None:
         crc = int(crc)
         assert crc >= 100 and crc <= 2000
-        res.append((f"CRC: {crc}", patcher.current_raising_coeff(crc)))
+        add(f"CRC: {crc}", 'current_raising_coeff', crc)
 
     motor_start_speed = flask.request.form.get('motor_start_speed', None)
     if motor_start_speed is not None:
         motor_start_speed = float(motor_start_speed)
         assert motor_start_speed >= 0 and motor_start_speed <= 100
-        res.append((f"Motor Start Speed: {motor_start_speed}km/h",
-                    patcher.motor_start_speed(motor_start_speed)))
+        add(f"Motor Start Speed: {motor_start_speed}km/h", 'motor_start_speed', motor_start_speed)
 
     kml = flask.request.form.get('kml', None)
     if kml:
@@ -306,23 +380,22 @@ def patch(data):
             assert l0 >= 0 and l0 <= 30
             assert l1 >= 0 and l1 <= 30
             assert l2 >= 0 and l2 <= 30
-            res.append((f"KERS Multiplier ({l0}, {l1}, {l2})",
-                        patcher.kers_multi(l0, l1, l2)))
+            add(f"KERS Multiplier ({l0}, {l1}, {l2})", 'kers_multi', l0, l1, l2)
     else:
         remove_kers = flask.request.form.get('remove_kers', None)
         if remove_kers is not None:
             if device == "4pro" or (is_nb and device != "g2"):
-                res.append(("Remove KERS", patcher.kers_multi(0, 0, 0)))
+                add("Remove KERS", 'kers_multi', 0, 0, 0)
             else:
-                res.append(("Remove KERS", patcher.remove_kers()))
+                add("Remove KERS", 'remove_kers')
 
     remove_autobrake = flask.request.form.get('remove_autobrake', None)
     if remove_autobrake is not None:
-        res.append(("Remove Speed Check", patcher.remove_autobrake()))
+        add("Remove Speed Check", 'remove_autobrake')
 
     remove_charging_mode = flask.request.form.get('remove_charging_mode', None)
     if remove_charging_mode is not None:
-        res.append(("Remove Charging Mode", patcher.remove_charging_mode()))
+        add("Remove Charging Mode", 'remove_charging_mode')
 
     wheelsize = flask.request.form.get('wheelsize', None)
     if wheelsize is not None:
@@ -332,85 +405,240 @@ def patch(data):
         if device == "4pro":
             old_wheel = 10.0
         mult = wheelsize/old_wheel
-        res.append((f"Wheel Size: {wheelsize}\"", patcher.wheel_speed_const(mult)))
+        add(f"Wheel Size: {wheelsize}\"", 'wheel_speed_const', mult)
 
     shutdown_time = flask.request.form.get('shutdown_time', None)
     if shutdown_time is not None:
         shutdown_time = float(shutdown_time)
         assert shutdown_time >= 0 and shutdown_time <= 20
-        res.append((f"Shutdown Time: {shutdown_time}s",
-                    patcher.shutdown_time(shutdown_time)))
+        add(f"Shutdown Time: {shutdown_time}s", 'shutdown_time', shutdown_time)
 
     cc_delay = flask.request.form.get('cc_delay', None)
     if cc_delay is not None:
         cc_delay = float(cc_delay)
         assert cc_delay >= 0 and cc_delay <= 9
-        res.append((f"CC Delay: {cc_delay}s",
-                    patcher.cc_delay(cc_delay)))
+        add(f"CC Delay: {cc_delay}s", 'cc_delay', cc_delay)
 
     amm = flask.request.form.get('ammeter', None)
     if amm is not None:
-        res.append(("Current-Meter", patcher.ampere_meter()))
+        add("Current-Meter", 'ampere_meter')
 
     rfm = flask.request.form.get('rfm', None)
     if rfm is not None:
-        res.append(("Region-Free", patcher.region_free()))
+        add("Region-Free", 'region_free')
 
     rml = flask.request.form.get('rml', None)
     if rml is not None:
         if is_nb:
-            res.append(("Remove Model Lock", patcher.skip_key_check()))
+            add("Remove Model Lock", 'skip_key_check')
         else:
-            res.append(("Remove Model Lock", patcher.remove_modellock()))
+            add("Remove Model Lock", 'remove_modellock')
 
     dmn = flask.request.form.get('dmn', None)
     if dmn is not None:
-        res.append(("Disable motor NTC", patcher.disable_motor_ntc()))
+        add("Disable motor NTC", 'disable_motor_ntc')
 
     blm = flask.request.form.get('blm', None)
     if blm is not None:
         # TEMPORARY WORKAROUND FOR 4PRO
         if device == "4pro":
-            res.append(("Static Brakelight", patcher.brake_light_static()))
+            add("Static Brakelight", 'brake_light_static')
         else:
-            res.append(("Static Brakelight", patcher.brake_light()))
+            add("Static Brakelight", 'brake_light')
 
     alm = flask.request.form.get('blm_alm', None)
     if alm is not None:
-        res.append(("Auto-Light", patcher.lower_light()))
+        add("Auto-Light", 'lower_light')
 
     pnb = flask.request.form.get('pnb', None)
     if pnb is not None:
-        res.append(("Pedestrian No-Blink", patcher.ped_noblink()))
+        add("Pedestrian No-Blink", 'ped_noblink')
 
     bts = flask.request.form.get('bts', None)
     if bts is not None:
-        res.append(("Button Swap", patcher.button_swap()))
+        add("Button Swap", 'button_swap')
 
     baud = flask.request.form.get('baud', None)
     if baud is not None:
-        res.append(("Baudrate", patcher.bms_baudrate(76800)))
+        add("Baudrate", 'bms_baudrate', 76800)
 
     volt = flask.request.form.get('volt', None)
     if volt is not None:
         volt = float(volt)
         assert volt >= 0 and volt <= 100
-        res.append((f"Voltage Limit: {volt}V", patcher.volt_limit(volt)))
+        add(f"Voltage Limit: {volt}V", 'volt_limit', volt)
+
+    return jobs
+
+
+def make_patcher(data, device, fingerprint=None):
+    # only the DRV of an exactly known image decides the variant order, a guess is checked
+    guess = fingerprint.drv if fingerprint is not None else None
+    drv = guess if fingerprint is not None and fingerprint.exact else None
+    if device in MI_DEVICES:
+        return MiPatcher(data, device, cache=offset_cache, drv=drv, drv_guess=guess)
+    elif device in NB_DEVICES:
+        return NbPatcher(data, device, cache=offset_cache, drv=drv, drv_guess=guess)
+    raise ValueError(f'Unknown device: {device}')
+
+
+def patch(data, jobs, fingerprint=None):
+    patcher = make_patcher(data, flask.request.form.get('device'), fingerprint)
+
+    flask.g.patch_results = patcher.results
+    res = patcher.run(jobs,
+                      dry_run=flask.request.form.get('patch') == 'Doc',
+                      best_effort=flask.request.form.get('best_effort') is not None)
+    failed = patcher.verify(res)
+    for result in patcher.results:
+        if result['title'] in failed:
+            result['unverified'] = failed[result['title']]
+    flask.g.find_stats = patcher.find_stats
+    if patcher.drv_mismatches:
+        print(f"DRV mismatch in {fingerprint}:", '; '.join(patcher.drv_mismatches))
+    return res, bytes(patcher.data)
+
+
+class UploadError(Exception):
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.status = status
+
+
+@app.errorhandler(UploadError)
+def handle_upload_error(e):
+    return str(e), e.status
+
+
+def input_kind(fname):
+    return next(ext for ext in ['.bin.enc', '.bin', '.zip'] if fname.endswith(ext))
+
+
+def session_firmware():
+    '''
+    Hashes of the files uploaded in this session, the only stored files it may reference.
+    '''
+    return flask.session.get('firmware', [])
+
+
+def remember_firmware(digest):
+    known = [d for d in session_firmware() if d != digest]
+    flask.session['firmware'] = (known + [digest])[-SESSION_FIRMWARE:]
+
+
+def uploaded_firmware():
+    '''
+    Return (file name, sha256, data) of the request's firmware, either uploaded or
+    referenced by the hash of a file this session uploaded before. Only files the store
+    does not have yet are added to it, a referenced file comes with the kind it was
+    uploaded as instead of a file name.
+    '''
+    f = flask.request.files.get('filename')
+    digest = flask.request.form.get('firmware_hash', '').strip().lower()
+
+    if f is not None and f.filename:
+        fname = f.filename.lower()
+        if not fname.endswith((".bin", ".zip", ".bin.enc")):
+            raise UploadError("Wrong file selected.")
+
+        data = f.read()
+        f.close()
+        if not len(data) > 0xf:
+            raise UploadError('No file selected.')
+        digest = FirmwareStore.digest(data)
+        if firmware_store is not None:
+            if not firmware_store.has(digest):
+                firmware_store.put(data, input_kind(fname))
+            remember_firmware(digest)
+        return fname, digest, data
+
+    if DIGEST.fullmatch(digest) and firmware_store is not None:
+        stored = firmware_store.get(digest) if digest in session_firmware() else None
+        if stored is None:
+            raise UploadError('Unknown firmware, please upload the file again.', 404)
+        data, kind = stored
+        return kind, digest, data
+    raise UploadError('No file selected.')
+
+
+def open_firmware(data, fname, dev):
+    '''
+    Unpack and decrypt the upload. Encrypted images are probed first (see Zippy.probe),
+    they are only decrypted in full once their first blocks fit the selected device.
+    '''
+    zippy = Zippy(data, model=dev)
+    if fname.endswith(".bin.enc"):
+        probe = zippy.probe(encrypted=True)
+    else:
+        # a zip entry without readable model id is encrypted, a plain .bin never is
+        probe = zippy.probe(encrypted=None if zippy.try_extract(decrypt=False) else False)
+
+    if probe.encrypted and not probe.readable:
+        raise UploadError('Decode error, the file does not decrypt into a firmware.')
+    if probe.enc_id is not None and dev in MI_DEVICES:
+        raise UploadError(f'This is a Ninebot firmware ({probe.enc_id.decode()}), '
+                          f'which does not fit the selected device {dev}.')
+    if probe.encrypted:
+        zippy.data = zippy.decrypt()
+    return zippy
 
-    return res, patcher.data
 
+def identify(data, dev):
+    '''
+    Fingerprint of the firmware, refuses a device selection it is known not to be for.
+    '''
+    fingerprint = Fingerprint(data, fingerprint_db)
+    family = 'mi' if dev in MI_DEVICES else 'nb' if dev in NB_DEVICES else None
+    if family and not fingerprint.matches(family, dev):
+        raise UploadError(f'This looks like {fingerprint}, which does not fit the selected device {dev}.')
+    return fingerprint
+
+
+def fingerprint_version():
+    # what an upload is identified as, and so its output, also depends on the known images
+    return fingerprint_db.digest() if fingerprint_db is not None else None
 
-@app.route('/cfw', methods=['POST'])
-def patch_firmware():
-    f = flask.request.files['filename']
 
-    fname = f.filename.lower()
-    if not fname.endswith((".bin", ".zip", ".bin.enc")):
-        return "Wrong file selected.", 400
+@app.route('/firmware/<digest>')
+def firmware_known(digest):
+    digest = digest.lower()
+    # only for this session's uploads, whether anyone else uploaded a file is nobody's business
+    known = digest in session_firmware() and firmware_store is not None and firmware_store.has(digest)
+    return flask.jsonify(known=known), 200 if known else 404
 
-    data = f.read()
-    if not len(data) > 0xf:
-        return 'No file selected.', 400
+
+@app.route('/applicable', methods=['POST'])
+def applicable():
+    fname, digest, data = uploaded_firmware()
+    dev = flask.request.form.get('device', None)
+    if dev not in MI_DEVICES + NB_DEVICES:
+        raise UploadError('No device selected.' if not dev else f'Unknown device: {dev}')
+
+    key = None
+    if output_cache is not None:
+        key = OutputKey(digest, (dev, input_kind(fname), fingerprint_version()), 'applicable', None, code_version)
+        hit = output_cache.get(key)
+        if hit is not None:
+            return flask.Response(hit[0], mimetype='application/json')
+
+    zippy = open_firmware(data, fname, dev)
+    fingerprint = identify(zippy.data, dev)
+    report = json.dumps(make_patcher(zippy.data, dev, fingerprint).applicability()).encode()
+    if key is not None:
+        output_cache.put(key, report)
+    return flask.Response(report, mimetype='application/json')
+
+
+@app.route('/fingerprint', methods=['POST'])
+def fingerprint():
+    fname, digest, data = uploaded_firmware()
+    zippy = open_firmware(data, fname, None)
+    return flask.jsonify(Fingerprint(zippy.data, fingerprint_db).as_dict())
+
+
+@app.route('/cfw', methods=['POST'])
+def patch_firmware():
+    fname, digest, data = uploaded_firmware()
 
     dev = flask.request.form.get('device', None)
     pod = flask.request.form.get('patch', None)
@@ -421,13 +649,27 @@ def patch_firmware():
         custom_enc_key = bytes.fromhex(custom_enc_key)
         assert len(custom_enc_key) == 16
 
-    zippy = Zippy(data, model=dev)
-    if fname.endswith(".bin.enc"):
-        zippy.data = zippy.decrypt()
-    zippy.try_extract()
-
+    jobs = patch_jobs()
+
+    # looked up before anything is unpacked, a hit is sent as it was stored
+    key = None
+    if output_cache is not None and pod in ['Bin', '.bin.enc', 'Zip']:
+        params = (dev, input_kind(fname), fingerprint_version(),
+                  flask.request.form.get('best_effort') is not None, repr(jobs))
+        key = OutputKey(digest, params, pod, custom_enc_key, code_version)
+        hit = output_cache.get(key)
+        if hit is not None:
+            data_patched, meta = hit
+            flask.g.patch_results = meta.get('results')
+            flask.g.output_cache = 'hit'
+            save_click('Bin' if pod == '.bin.enc' else pod)
+            return send_output(data_patched, pod, dev)
+        flask.g.output_cache = 'miss'
+
+    zippy = open_firmware(data, fname, dev)
+    fingerprint = identify(zippy.data, dev)
     try:
-        res, data_patched = patch(zippy.data)
+        res, data_patched = patch(zippy.data, jobs, fingerprint)
         if (
             not res
             and (
@@ -440,36 +682,63 @@ def patch_firmware():
         zippy.params = params
         zippy.data = data_patched
     except SignatureException as e:
-        return f'Some of the patches (patcher.{inspect.trace()[-2][3]}()) could not be applied. Please select unmodified input file. Message: {str(e)}'
+        failed = [r['mod'] for r in flask.g.get('patch_results', []) if r['status'] == 'failed']
+        return f'Some of the patches (patcher.{", ".join(failed)}()) could not be applied. Please select unmodified input file. Message: {str(e)}'
 
     if pod in ['Bin', '.bin.enc', 'Zip']:
-        filename = f"ngfw_{dev}_{get_datetime()}"
-        mem = io.BytesIO()
+        meta = {'results': flask.g.patch_results}
         if pod == 'Zip':
-            data_patched = zippy.zip_it('nice'.encode(), key=custom_enc_key)
-            filename += ".zip"
-        elif pod == 'Bin':
-            filename += ".bin"
-        elif pod == ".bin.enc":
-            pod = 'Bin'
-            data_patched = zippy.encrypt(custom_enc_key)
-            filename += ".bin.enc"
-
-        mem.write(data_patched)
-        mem.seek(0)
-
-        #r = flask.Response(mem, mimetype="application/octet-stream")
-        #r.headers['Content-Length'] = mem.getbuffer().nbytes
-        #r.headers['Content-Disposition'] = "attachment; filename={}".format(f.filename)
-        save_click(pod)
-        return flask.send_file(
-            mem,
-            as_attachment=True,
-            mimetype='application/octet-stream',
-            download_name=filename,
-        )
+            data_patched = zippy.zip_stream('nice'.encode(), key=custom_enc_key)
+            if key is not None:
+                data_patched = cache_stream(data_patched, key, meta)
+        else:
+            if pod == ".bin.enc":
+                data_patched = zippy.encrypt(custom_enc_key)
+            if key is not None:
+                output_cache.put(key, data_patched, meta)
+
+        save_click('Bin' if pod == '.bin.enc' else pod)
+        return send_output(data_patched, pod, dev)
     elif pod in ['Doc']:
         save_click(pod)
-        return flask.render_template('doc.html', patches=res)
+        return flask.render_template('doc.html', patches=res, results=flask.g.patch_results)
     else:
         return 'Invalid request.', 400
+
+
+def cache_stream(chunks, key, meta):
+    '''
+    Pass the chunks on, the archive is cached once all of them went out.
+    '''
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    output_cache.put(key, b''.join(sent), meta)
+
+
+def send_output(data_patched, pod, dev):
+    filename = f"ngfw_{dev}_{get_datetime()}"
+    filename += {'Zip': ".zip", 'Bin': ".bin", '.bin.enc': ".bin.enc"}[pod]
+
+    if not isinstance(data_patched, bytes):
+        # a stream of chunks, sent as they are produced
+        flask.g.streamed = True
+        return flask.Response(
+            data_patched,
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename={filename}'},
+        )
+
+    # shares the bytes instead of copying them
+    mem = io.BytesIO(data_patched)
+
+    #r = flask.Response(mem, mimetype="application/octet-stream")
+    #r.headers['Content-Length'] = mem.getbuffer().nbytes
+    #r.headers['Content-Disposition'] = "attachment; filename={}".format(f.filename)
+    return flask.send_file(
+        mem,
+        as_attachment=True,
+        mimetype='application/octet-stream',
+        download_name=filename,
+    )
@@ -184,6 +184,11 @@ function UdateVisibilityForDevice(dev) {
 }
 
 function ChangeDevice() {
+    // the presets decide again, forget what an applicability check disabled
+    document.querySelectorAll("[data-inapplicable]").forEach(cb => {
+        delete cb.dataset.inapplicable;
+        cb.title = "";
+    });
     Preset_Default();
     const dev = document.getElementById("devselect").value;
     UdateVisibilityForDevice(dev);
@@ -205,6 +210,7 @@ function ChangeDevice() {
         case "f3pro": Preset_F3Pro(); break;
         case "gt3": Preset_GT3(); break;
     }
+    CheckApplicability();
 }
 
 function Preset_1S() {
@@ -502,6 +508,142 @@ function Preset_Default() {
     ChangeForm(forms.KML_L2, "20", null);
 }
 
+// Hash-first upload: only send the firmware file when the server doesn't have it yet
+const firmwareHashes = new WeakMap();
+
+async function HashFirmware(file) {
+    if (!firmwareHashes.has(file)) {
+        const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+        firmwareHashes.set(file, Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, "0")).join(""));
+    }
+    return firmwareHashes.get(file);
+}
+
+async function OnSubmit(e) {
+    const form = e.target;
+    const input = GetForm("filename");
+    const file = input.files[0];
+    if (form.dataset.hashed || !file || !window.crypto || !crypto.subtle) {
+        return;
+    }
+    e.preventDefault();
+
+    let known = false;
+    try {
+        const hash = await HashFirmware(file);
+        known = (await fetch(`/firmware/${hash}`)).ok;
+        GetForm("firmware_hash").value = known ? hash : "";
+    } catch (ex) {
+        known = false;
+    }
+
+    // disabled inputs are left out of the request
+    input.disabled = known;
+    form.dataset.hashed = "1";
+    form.requestSubmit(e.submitter);
+    delete form.dataset.hashed;
+    input.disabled = false;
+}
+
+// Mods with a checkbox of their own, disabled when /applicable reports them as not applicable
+const modForms = {
+    "dpc": "dpc",
+    "remove_autobrake": "remove_autobrake",
+    "remove_charging_mode": "remove_charging_mode",
+    "region_free": "rfm",
+    "us_region_spoof": "us_region_spoof",
+    "bms_baudrate": "baud",
+    "motor_start_speed": "motor_start_speed_cb",
+    "cc_delay": "cc_delay_cb",
+    "current_raising_coeff": "crc_cb",
+    "wheel_speed_const": "wheelsize_cb",
+    "shutdown_time": "shutdown_time_cb",
+    "volt_limit": "volt_cb",
+    "embed_enc_key": "embed_enc_key_cb",
+    "embed_rand_code": "embed_rand_code_cb",
+};
+
+// Request body with the selected firmware, only its hash if the server already has the file
+async function FirmwareBody(file) {
+    const body = new FormData();
+    body.append("device", document.getElementById("devselect").value);
+    const hash = window.crypto && crypto.subtle ? await HashFirmware(file) : null;
+    if (hash && (await fetch(`/firmware/${hash}`)).ok) {
+        body.append("firmware_hash", hash);
+    } else {
+        body.append("filename", file);
+    }
+    return body;
+}
+
+// Select the device of a known stock firmware, returns whether it changed
+async function DetectDevice() {
+    const file = GetForm("filename").files[0];
+    if (!file) {
+        return false;
+    }
+    try {
+        const response = await fetch("/fingerprint", { method: "POST", body: await FirmwareBody(file) });
+        if (!response.ok) {
+            return false;
+        }
+        const models = (await response.json()).models;
+        const select = document.getElementById("devselect");
+        if (!models.length || models.includes(select.value)) {
+            return false;
+        }
+        select.value = models[0];
+        ChangeDevice();
+        return true;
+    } catch (ex) {
+        console.log(ex);
+        return false;
+    }
+}
+
+async function OnFileChange() {
+    if (!(await DetectDevice())) {
+        CheckApplicability();
+    }
+}
+
+async function CheckApplicability() {
+    const file = GetForm("filename").files[0];
+    if (!file) {
+        return;
+    }
+    try {
+        const response = await fetch("/applicable", { method: "POST", body: await FirmwareBody(file) });
+        if (!response.ok) {
+            return;
+        }
+        const report = await response.json();
+        for (const [mod, name] of Object.entries(modForms)) {
+            const entry = report[mod];
+            const cb = GetForm(name);
+            if (!cb) {
+                continue;
+            }
+            // undo an earlier check of another file
+            if (cb.dataset.inapplicable) {
+                delete cb.dataset.inapplicable;
+                cb.disabled = false;
+                cb.title = "";
+            }
+            if (!entry || entry.applicable !== false || cb.disabled) {
+                continue;
+            }
+            cb.checked = false;
+            cb.disabled = true;
+            cb.dataset.inapplicable = "1";
+            cb.title = `Not applicable to this firmware (${entry.reason})`;
+            cb.dispatchEvent(new Event("change"));
+        }
+    } catch (ex) {
+        console.log(ex);
+    }
+}
+
 // Initialize form values from URL parameters on page load
 const formValues = Object.values(forms);
 const queryStrings = window.location.search.substring(1);
@@ -560,6 +702,9 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     });
 
+    document.querySelector('form[action="/cfw"]').addEventListener('submit', OnSubmit);
+    GetForm("filename").addEventListener('change', OnFileChange);
+
     // Store collapse states in localStorage
     document.querySelectorAll('.collapse').forEach(collapse => {
         collapse.addEventListener('show.bs.collapse', function () {
@@ -17,11 +17,18 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+import hashlib
+import inspect
+import threading
+from bisect import bisect_left
 from enum import Enum
+from functools import lru_cache
 
-import capstone
-import keystone
-from util import FindPattern, SignatureException
+from cache import SignatureDigest
+from image import PatchedImage
+from layout import FirmwareLayout
+from thumb import Encode
+from util import FindAll, FindPairs, MatchAt, MultiPattern, SignatureException
 
 
 class PatchGroup(Enum):
@@ -39,51 +46,493 @@ def patch(label, description, group, min=None, max=None):
         return func
     return decorator
 
+class EnginePool(threading.local):
+    '''
+    Process-wide keystone/capstone engines shared by all patchers.
+    The engines are not thread-safe, so every thread gets its own set on first use.
+    keystone and capstone are only loaded once an engine is actually needed.
+    '''
+    def __init__(self):
+        self.assemblers = {}
+        self._cs = None
+
+    def assembler(self, mode='thumb'):
+        if mode not in self.assemblers:
+            import keystone
+            modes = {'thumb': keystone.KS_MODE_THUMB, 'arm': keystone.KS_MODE_ARM}
+            self.assemblers[mode] = keystone.Ks(keystone.KS_ARCH_ARM, modes[mode])
+        return self.assemblers[mode]
+
+    @property
+    def ks(self):
+        return self.assembler('thumb')
+
+    @property
+    def cs(self):
+        if self._cs is None:
+            import capstone
+            self._cs = capstone.Cs(capstone.CS_ARCH_ARM, capstone.CS_MODE_THUMB)
+        return self._cs
+
+
+ENGINES = EnginePool()
+
+
+@lru_cache(maxsize=2048)
+def Assemble(src, addr=0, mode='thumb'):
+    '''
+    Assemble src at addr, memoized process-wide (see Assemble.cache_info()).
+    Single Thumb instructions are encoded natively (see thumb.Encode), everything else
+    goes through keystone.
+    '''
+    if mode == 'thumb':
+        code = Encode(src, addr)
+        if code is not None:
+            return code
+    return bytes(ENGINES.assembler(mode).asm(src, addr)[0])
+
+def Disassemble(code, addr=0):
+    '''
+    Return the listing of code and whether it decodes into whole Thumb instructions.
+    '''
+    lines, end = [], 0
+    for ofs, size, mnemonic, op_str in ENGINES.cs.disasm_lite(code, addr):
+        lines.append(' '.join([code[ofs - addr:ofs - addr + size].hex(), mnemonic, op_str]))
+        end = ofs - addr + size
+    return lines, end == len(code)
+
+
+class PatchRecord():
+    '''
+    One patched region: name, offset and the raw bytes before and after the patch.
+    Hex and disassembly are only rendered when asked for, iterating yields the
+    (name, hex offset, hex pre, hex post) tuple mods used to return.
+    The disassembly is cached, valid tells whether post decoded into whole instructions.
+    '''
+    __slots__ = ('name', 'ofs', 'pre', 'post', 'listings', 'valid')
+
+    def __init__(self, name, ofs, pre, post):
+        self.name = name
+        self.ofs = ofs
+        self.pre = bytes(pre)
+        self.post = bytes(post)
+        self.listings = {}
+        self.valid = None
+
+    def __iter__(self):
+        return iter((self.name, hex(self.ofs), self.pre.hex(), self.post.hex()))
+
+    def __repr__(self):
+        return 'PatchRecord({!r}, {}, {}, {})'.format(*self)
+
+    def disasm(self, which='post'):
+        if which not in self.listings:
+            self.listings[which], complete = Disassemble(getattr(self, which), self.ofs)
+            if which == 'post':
+                self.valid = complete
+        return self.listings[which]
+
+
+def signatures(*sigs):
+    '''
+    Declare the signatures a mod searches for, so they can be prefetched in one pass.
+    Variants as used by BasePatcher.resolve are accepted too, with all signatures they require.
+    '''
+    def decorator(func):
+        func.signatures = tuple(s for sig in sigs for s in _variant_signatures(sig))
+        return func
+    return decorator
+
+
+def _variant_signatures(variant):
+    # a variant is (signature, offset, register, *required signatures), anything else a plain signature
+    return [variant[0], *variant[3:]] if isinstance(variant, tuple) else [variant]
+
+
+def _key(sig, mask=None):
+    # signatures are keyed by tuple(sig), masked ones by (tuple(sig), tuple(mask))
+    return tuple(sig) if not mask else (tuple(sig), tuple(mask))
+
+
+def _split(key):
+    return key if key and isinstance(key[0], tuple) else (key, None)
+
+
+@lru_cache(maxsize=32)
+def _compile(keys):
+    sigs, masks = zip(*map(_split, keys))
+    return MultiPattern(sigs, masks)
+
+
 class BasePatcher():
-    def __init__(self, data, model):
-        self.data = bytearray(data)
-        self.ks = keystone.Ks(keystone.KS_ARCH_ARM, keystone.KS_MODE_THUMB)
-        self.cs = capstone.Cs(capstone.CS_ARCH_ARM, capstone.CS_MODE_THUMB)
+    defaults = {
+        "dummy": {
+            "speed_limit_ped": 20,
+            "speed_limit_drive": 25,
+            "speed_limit_sport": 30,
+            "ampere_ped": 5000,
+            "ampere_drive": 15000,
+            "ampere_sport": 20000,
+            "ampere_ped_max": 10000,
+            "ampere_drive_max": 25000,
+            "ampere_sport_max": 35000,
+            "ampere_brake_min": 5000,
+            "ampere_brake_max": 50000,
+            "volt_limit": 43.01,
+            "current_raising_coeff": 600,
+            "motor_start_speed": 5.0,
+            "wheel_speed_const": 1.0,
+            "shutdown_time": 3.0,
+            "cc_delay": 5.0,
+            "wheel_size": 8.5,
+            "embed_rand_code": "cfw.sh",
+            "embed_enc_key": "FE 80 1C B2 D1 EF 41 A6 A4 17 31 F5 A0 68 24 F0"
+        }
+    }
+    # probe arguments of mods whose parameters are all optional (see applicability)
+    probes = {
+        "ampere_max": {"amps_ped": 10000, "amps_drive": 25000, "amps_sport": 35000},
+        "ampere_brake": {"min_": 5000, "max_": 50000},
+    }
+    # DRV version -> signatures only found in it (see resolve)
+    drv_signatures = {}
+    # search windows of single mods: name -> (layout region, lowest offset)
+    windows = {}
+
+    def __init__(self, data, model, cache=None, drv=None, drv_guess=None):
+        self.data = PatchedImage(data)
+        self.matches = {}
+        self.prefetched = False
+        self._dirty_ranges = []
+        self._dirty_seen = 0
+        self._layout = None
+        self.find_stats = {'hits': 0, 'misses': 0}
+        self.results = []
+        self.cache = cache
+        self.firmware = hashlib.md5(self.data.original).hexdigest() if cache is not None else None
 
         self.model = model
+        # variants are reordered for a known drv, a guessed one is only checked (see resolve)
+        self.drv = drv
+        self.drv_guess = drv_guess
+        self.drv_mismatches = []
 
-        self.defaults = {
-            "dummy": {
-                "speed_limit_ped": 20,
-                "speed_limit_drive": 25,
-                "speed_limit_sport": 30,
-                "ampere_ped": 5000,
-                "ampere_drive": 15000,
-                "ampere_sport": 20000,
-                "ampere_ped_max": 10000,
-                "ampere_drive_max": 25000,
-                "ampere_sport_max": 35000,
-                "ampere_brake_min": 5000,
-                "ampere_brake_max": 50000,
-                "volt_limit": 43.01,
-                "current_raising_coeff": 600,
-                "motor_start_speed": 5.0,
-                "wheel_speed_const": 1.0,
-                "shutdown_time": 3.0,
-                "cc_delay": 5.0,
-                "wheel_size": 8.5
-            }
-        }
-    
     def get_defaults(self, device):
-        return self.defaults.get(device, {})
-
-    def asm(self, x):
-        pre = bytes(self.ks.asm(x)[0])
-        return pre
+        return dict(self.defaults.get(device, {}))
+
+    @property
+    def ks(self):
+        return ENGINES.ks
+
+    @property
+    def cs(self):
+        return ENGINES.cs
+
+    @classmethod
+    def mod_signatures(cls, mods=None):
+        sigs = {}
+        for name in (dir(cls) if mods is None else mods):
+            for sig in getattr(getattr(cls, name, None), 'signatures', ()):
+                sigs[tuple(sig)] = sig
+        return list(sigs.values())
+
+    def prefetch(self, mods=None):
+        '''
+        Search all signatures declared by the given mods (default: all mods) in one pass.
+        '''
+        self.prefetched = True
+        self.scan(self.mod_signatures(mods))
+
+    def scan(self, sigs, masks=None):
+        '''
+        Search all given signatures that are not known yet in one pass over the original image.
+        Several signatures are matched together (see MultiPattern), a single one goes through
+        the FindPattern backends.
+        '''
+        sigs = list(sigs)
+        keys = (_key(sig, mask) for sig, mask in zip(sigs, masks or [None] * len(sigs)))
+        keys = tuple(dict.fromkeys(k for k in keys if k not in self.matches))
+        if not keys:
+            return
+
+        if self.cache is not None:
+            hits = self.cache.get(self.firmware, keys)
+            for key in keys:
+                digest = SignatureDigest(key)
+                if digest in hits:
+                    self.matches[key] = hits[digest]
+            keys = tuple(k for k in keys if k not in self.matches)
+            if not keys:
+                return
+
+        if len(keys) == 1:
+            sig, mask = _split(keys[0])
+            results = {keys[0]: list(FindAll(self.data.original, sig, mask=mask))}
+        else:
+            results = dict(zip(keys, _compile(keys).scan(self.data.original)))
+        self.matches.update(results)
+        if self.cache is not None:
+            self.cache.put(self.firmware, results)
+
+    def find(self, sig, mask=None, start=None, region='code'):
+        '''
+        First match at or after start in the current image, inside the given region (see region).
+        Matches are only ever searched in the original image (see scan), the ranges
+        written since are the only places where they can differ and are checked again.
+        '''
+        lo, hi = self.region(region)
+        ofs = self._find(sig, mask=mask, start=max(start or 0, lo))
+        if ofs + len(sig) > hi:
+            raise SignatureException('Pattern not found!')
+        return ofs
+
+    @property
+    def layout(self):
+        if self._layout is None:
+            self._layout = FirmwareLayout(self.data.original)
+        return self._layout
+
+    def region(self, name):
+        '''
+        (start, stop) of a layout region or of one of the patcher's windows, 'any' is the whole image.
+        Instructions are searched in 'code', literals and tables in 'any'.
+        '''
+        if name == 'any':
+            return 0, len(self.data)
+        if name in self.windows:
+            name, lowest = self.windows[name]
+            start, stop = self.layout.region(name)
+            return max(start, lowest), stop
+        return self.layout.region(name)
+
+    def _dirty(self):
+        # disjoint sorted union of all ranges ever written
+        writes = self.data.writes
+        if self._dirty_seen < len(writes):
+            merged = []
+            for lo, hi in sorted(self._dirty_ranges + writes[self._dirty_seen:]):
+                if merged and lo <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+                else:
+                    merged.append((lo, hi))
+            self._dirty_ranges, self._dirty_seen = merged, len(writes)
+        return self._dirty_ranges
+
+    def _find(self, sig, mask=None, start=None):
+        if not self.prefetched:
+            self.prefetch()
+        key = _key(sig, mask)
+        if key in self.matches:
+            self.find_stats['hits'] += 1
+        else:
+            self.find_stats['misses'] += 1
+            self.scan([sig], [mask])
+
+        found, dirty = self.matches[key], self._dirty()
+        dirty_starts = [lo for lo, _ in dirty]
+        start, size = start or 0, len(sig)
+
+        # first original match that no write touched
+        ofs = None
+        for i in range(bisect_left(found, start), len(found)):
+            k = bisect_left(dirty_starts, found[i] + size) - 1
+            if k < 0 or dirty[k][1] <= found[i]:
+                ofs = found[i]
+                break
+
+        # anything before it overlapping a written range is checked on the current bytes
+        for lo, hi in dirty:
+            a = max(start, lo - size + 1)
+            if ofs is not None and a >= ofs:
+                break
+            b = hi if ofs is None else min(hi, ofs)
+            window = self.data[a:b + size - 1]
+            for i in range(b - a):
+                if MatchAt(window, i, sig, mask):
+                    ofs = a + i
+                    break
+
+        if ofs is None:
+            raise SignatureException('Pattern not found!')
+        return ofs
+
+    def find_all(self, sig, start=None, end=None, region='code'):
+        return FindAll(self.data, sig, start=start, end=end, find=self._finder(region))
+
+    def find_pairs(self, first, second, start=None, end=None, window=None, region='code'):
+        return FindPairs(self.data, first, second, start=start, end=end, window=window, find=self._finder(region))
+
+    def _finder(self, region):
+        def find(sig, mask=None, start=None):
+            return self.find(sig, mask=mask, start=start, region=region)
+        return find
+
+    def resolve(self, variants):
+        '''
+        Return (offset, register) of the first variant that matches, in priority order.
+        A variant is (signature, offset adjustment, register, *required signatures), it only
+        matches if its required signatures are found as well. All of them are scanned together.
+        Where variants differ in more than the register it holds whatever tells them apart (e.g. the DRV).
+        With a known DRV version its own variants go first, the others stay as fallback.
+        A guessed DRV keeps the order, a variant of another DRV matching is logged in drv_mismatches.
+        '''
+        self.scan(sig for variant in variants for sig in _variant_signatures(variant))
+        preferred = {tuple(sig) for sig in self.drv_signatures.get(self.drv, ())}
+        if preferred:
+            variants = sorted(variants, key=lambda v: tuple(v[0]) not in preferred)
+        for sig, adj, reg, *required in variants:
+            try:
+                ofs = self.find(sig) + adj
+                for other in required:
+                    self.find(other)
+            except SignatureException:
+                continue
+            self._check_guess(variants, sig, ofs)
+            return ofs, reg
+        raise SignatureException('Pattern not found!')
+
+    def _check_guess(self, variants, sig, ofs):
+        guess = self.drv_guess
+        if guess is None or self.drv is not None:
+            return
+        drvs = {tuple(s): drv for drv, sigs in self.drv_signatures.items() for s in sigs}
+        matched = drvs.get(tuple(sig))
+        if matched != guess and (matched is not None or guess in [drvs.get(tuple(v[0])) for v in variants]):
+            self.drv_mismatches.append(f'{hex(ofs)}: {f"DRV {matched}" if matched else "default"} variant '
+                                       f'matched, DRV {guess} was guessed')
+
+    def run(self, jobs, dry_run=False, best_effort=False):
+        '''
+        Two-phase patching of a list of (title, mod name, args, kwargs) jobs.
+        Every mod is resolved against the unmodified image, its writes go to its own
+        layer of the image (see PatchedImage) and all layers are committed at the end.
+        Returns [(title, mod result)] of the applied mods, with dry_run the layers are dropped instead.
+        A failing mod aborts the run, with best_effort only its own writes are rolled back
+        and it is reported as skipped. Every job gets an entry in results.
+        '''
+        self.prefetch([mod for _, mod, _, _ in jobs])
+
+        res, applied = [], []
+        try:
+            for title, mod, args, kwargs in jobs:
+                self.data.begin(title)
+                mismatches = len(self.drv_mismatches)
+                try:
+                    res.append((title, getattr(self, mod)(*args, **kwargs)))
+                except Exception as ex:
+                    self.data.drop(title)
+                    reason = f'{type(ex).__name__}: {ex}' if str(ex) else type(ex).__name__
+                    self._result(title, mod, 'skipped' if best_effort else 'failed', reason, mismatches)
+                    if not best_effort:
+                        raise
+                    continue
+                applied.append(title)
+                self._result(title, mod, 'applied', None, mismatches)
+        except Exception:
+            for name in applied:
+                self.data.drop(name)
+            raise
+        finally:
+            self.data.end()
+
+        if dry_run:
+            for name in applied:
+                self.data.drop(name)
+        else:
+            self.data.commit(applied)
+        return res
+
+    def _result(self, title, mod, status, reason, mismatches):
+        result = {'title': title, 'mod': mod, 'status': status, 'reason': reason}
+        if len(self.drv_mismatches) > mismatches:
+            result['drv_mismatch'] = self.drv_mismatches[mismatches:]
+        self.results.append(result)
+
+    @classmethod
+    def patch_mods(cls):
+        '''
+        Names of all @patch mods, the decorator may sit on an overridden base method.
+        '''
+        return sorted({name for klass in cls.__mro__ for name, func in vars(klass).items() if hasattr(func, 'label')})
+
+    def probe_args(self, mod):
+        '''
+        Keyword arguments to try a mod with: the probes entry of the mod, else the parameter defaults
+        (of the mod or the method it overrides) and the device default of the mod for its first parameter.
+        None if a parameter is left without.
+        '''
+        if mod in self.probes:
+            return dict(self.probes[mod])
+        defaults = {**BasePatcher.defaults['dummy'], **self.get_defaults(self.model)}
+        base = inspect.signature(getattr(BasePatcher, mod, getattr(self, mod))).parameters
+        kwargs = {}
+        for name, param in inspect.signature(getattr(self, mod)).parameters.items():
+            if param.default is not param.empty or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                break
+            default = base[name].default if name in base else param.empty
+            if default is param.empty and not kwargs:
+                default = defaults.get(mod, param.empty)
+            if default is param.empty:
+                return None
+            kwargs[name] = default
+        return kwargs
+
+    def applicability(self, mods=None):
+        '''
+        Try every @patch mod (default) against the unmodified image with its probe arguments.
+        All signatures are resolved in one scan up front, each mod's writes are dropped right away.
+        Returns {mod: {'applicable': bool or None if it could not be tried, 'offsets': [...], 'reason': ...}}.
+        A mod that patches nothing for the model (returns None or no records) is not applicable.
+        '''
+        mods = self.patch_mods() if mods is None else mods
+        self.prefetch(mods)
+
+        report = {}
+        for mod in mods:
+            kwargs = self.probe_args(mod)
+            if kwargs is None:
+                report[mod] = {'applicable': None, 'offsets': [], 'reason': 'no probe arguments'}
+                continue
+            self.data.begin(mod)
+            try:
+                records = getattr(self, mod)(**kwargs)
+                if records:
+                    report[mod] = {'applicable': True, 'offsets': [hex(rec.ofs) for rec in records], 'reason': None}
+                else:
+                    reason = f'no patch for {self.model}' if records is None else 'nothing to patch'
+                    report[mod] = {'applicable': False, 'offsets': [], 'reason': reason}
+            except Exception as ex:
+                reason = f'{type(ex).__name__}: {ex}' if str(ex) else type(ex).__name__
+                report[mod] = {'applicable': False, 'offsets': [], 'reason': reason}
+            finally:
+                self.data.drop(mod)
+        return report
+
+    def asm(self, x, addr=0):
+        return Assemble(x, addr)
 
     def disasm(self, pre):
-        pre_dis = [' '.join([x.bytes.hex(), x.mnemonic, x.op_str])
-                   for x in self.cs.disasm(pre, 0)]
-        return pre_dis
+        return Disassemble(pre)[0]
+
+    def verify(self, res):
+        '''
+        Verification pass over the output of run(): every patched region in code has to
+        decode into whole Thumb instructions. The listings stay cached on the records.
+        Returns {title: [names of the records that failed]}.
+        '''
+        code, data = self.layout.region('code'), self.layout.regions.get('id')
+        failed = {}
+        for title, records in res:
+            for rec in records:
+                if not code[0] <= rec.ofs < code[1] or (data and data[0] <= rec.ofs < data[1]):
+                    continue
+                rec.disasm('post')
+                if not rec.valid:
+                    failed.setdefault(title, []).append(rec.name)
+        return failed
 
     def ret(self, descr, ofs, pre, post):
-        return [(descr, hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord(descr, ofs, pre, post)]
 
     @patch(label="embed_rand_code",
            description="Embed custom rand code.",
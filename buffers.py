@@ -0,0 +1,33 @@
+import threading
+
+
+class BufferStats(threading.local):
+    '''
+    Firmware sized buffers the current thread allocated since the last reset:
+    how many, their total size and the largest one.
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.copies = 0
+        self.copied = 0
+        self.largest = 0
+
+    def count(self, size):
+        self.copies += 1
+        self.copied += size
+        self.largest = max(self.largest, size)
+
+
+STATS = BufferStats()
+
+
+def Copy(data, mutable=False):
+    '''
+    Counted copy of a buffer (see STATS), bytes unless a mutable bytearray is asked for.
+    Everything else passes the one buffer around by reference.
+    '''
+    buf = bytearray(data) if mutable else bytes(data)
+    STATS.count(len(buf))
+    return buf
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+
+# bump whenever the matching semantics change, invalidates all entries
+CACHE_VERSION = 1
+
+
+def SignatureDigest(sig):
+    '''
+    Stable key for a signature, changes whenever the signature definition changes.
+    '''
+    key = repr((CACHE_VERSION, tuple(sig)))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def SourceDigest(paths):
+    '''
+    Digest of the given source files, changes with every edit of the patch code.
+    '''
+    md5 = hashlib.md5()
+    for path in paths:
+        with open(path, 'rb') as fp:
+            md5.update(fp.read())
+    return md5.hexdigest()
+
+
+def OutputKey(firmware, params, kind, key=None, version=''):
+    '''
+    Key of a patched artifact: input firmware hash, normalized patch parameters,
+    output kind, custom encryption key and patch code version.
+    '''
+    key = repr((CACHE_VERSION, version, firmware, params, kind, key.hex() if key else None))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class OffsetCache():
+    '''
+    On-disk cache of signature offsets, keyed by (firmware md5, signature digest).
+    An empty offset list records a signature known to be absent from the firmware.
+    Least recently used rows are evicted once more than max_entries are stored.
+    '''
+    def __init__(self, path, max_entries=50000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        with closing(self.connect()) as con, con:
+            con.execute('CREATE TABLE IF NOT EXISTS offsets('
+                        'firmware TEXT, signature TEXT, offsets BLOB, used REAL, '
+                        'PRIMARY KEY(firmware, signature))')
+            con.execute('CREATE INDEX IF NOT EXISTS offsets_used ON offsets(used)')
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, firmware, sigs):
+        '''
+        Return {signature digest: offsets} for all cached signatures of the firmware.
+        '''
+        digests = [SignatureDigest(sig) for sig in sigs]
+        if not digests:
+            return {}
+
+        res = {}
+        with closing(self.connect()) as con, con:
+            for i in range(0, len(digests), 500):
+                chunk = digests[i:i+500]
+                rows = con.execute(
+                    'SELECT signature, offsets FROM offsets WHERE firmware = ? AND signature IN ({})'
+                    .format(','.join('?' * len(chunk))), [firmware, *chunk])
+                for digest, blob in rows:
+                    res[digest] = array('I', blob).tolist()
+            if res:
+                con.execute('UPDATE offsets SET used = ? WHERE firmware = ?', (time.time(), firmware))
+        return res
+
+    def put(self, firmware, entries):
+        '''
+        Store {signature: offsets} for the firmware.
+        '''
+        now = time.time()
+        rows = [(firmware, SignatureDigest(sig), array('I', ofs).tobytes(), now)
+                for sig, ofs in entries.items()]
+        if not rows:
+            return
+
+        with closing(self.connect()) as con, con:
+            con.executemany('INSERT OR REPLACE INTO offsets VALUES (?, ?, ?, ?)', rows)
+            count = con.execute('SELECT COUNT(*) FROM offsets').fetchone()[0]
+            if count > self.max_entries:
+                con.execute('DELETE FROM offsets WHERE rowid IN '
+                            '(SELECT rowid FROM offsets ORDER BY used LIMIT ?)',
+                            (count - self.max_entries,))
+
+
+class OutputCache():
+    '''
+    Cache of patched artifacts by OutputKey, an in-memory LRU tier in front of an on-disk tier.
+    Each entry is the artifact and a JSON serializable meta dict.
+    Both tiers evict least recently used entries once their payloads exceed the byte bounds.
+    '''
+    def __init__(self, path, max_bytes=256 << 20, max_memory=32 << 20):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.max_memory = max_memory
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {'memory': 0, 'disk': 0, 'misses': 0}
+        with closing(self.connect()) as con, con:
+            con.execute('CREATE TABLE IF NOT EXISTS outputs('
+                        'key TEXT PRIMARY KEY, meta TEXT, payload BLOB, size INTEGER, used REAL)')
+            con.execute('CREATE INDEX IF NOT EXISTS outputs_used ON outputs(used)')
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        '''
+        Return (payload, meta) or None.
+        '''
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory'] += 1
+                return self.memory[key]
+
+        with closing(self.connect()) as con, con:
+            row = con.execute('SELECT payload, meta FROM outputs WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                con.execute('UPDATE outputs SET used = ? WHERE key = ?', (time.time(), key))
+        with self.lock:
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk'] += 1
+        entry = bytes(row[0]), json.loads(row[1])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, payload, meta=None):
+        payload = bytes(payload)
+        entry = payload, meta or {}
+        self._remember(key, entry)
+        if len(payload) > self.max_bytes:
+            return
+
+        with closing(self.connect()) as con, con:
+            con.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)',
+                        (key, json.dumps(entry[1]), payload, len(payload), time.time()))
+            total = con.execute('SELECT TOTAL(size) FROM outputs').fetchone()[0]
+            rows = con.execute('SELECT key, size FROM outputs ORDER BY used').fetchall() \
+                if total > self.max_bytes else []
+            evict = []
+            for old, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evict.append((old,))
+                total -= size
+            con.executemany('DELETE FROM outputs WHERE key = ?', evict)
+
+    def _remember(self, key, entry):
+        size = len(entry[0])
+        if size > self.max_memory:
+            return
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= len(self.memory.pop(key)[0])
+            self.memory[key] = entry
+            self.memory_bytes += size
+            while self.memory_bytes > self.max_memory:
+                _, (old, _) = self.memory.popitem(last=False)
+                self.memory_bytes -= len(old)
+
+
+class FirmwareStore():
+    '''
+    On-disk store of uploaded firmware files by sha256 digest, so clients can refer to
+    a file the server already has instead of uploading it again.
+    Each file is kept with its input kind ('.bin', '.bin.enc' or '.zip'), the least
+    recently used ones are dropped once the stored files exceed max_bytes.
+    '''
+    def __init__(self, path, max_bytes=128 << 20):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        with closing(self.connect()) as con, con:
+            con.execute('CREATE TABLE IF NOT EXISTS firmware('
+                        'digest TEXT PRIMARY KEY, data BLOB, size INTEGER, used REAL, kind TEXT)')
+            if 'kind' not in [row[1] for row in con.execute('PRAGMA table_info(firmware)')]:
+                # stores created before the kind was kept
+                con.execute('DELETE FROM firmware')
+                con.execute('ALTER TABLE firmware ADD COLUMN kind TEXT')
+            con.execute('CREATE INDEX IF NOT EXISTS firmware_used ON firmware(used)')
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def has(self, digest):
+        with closing(self.connect()) as con, con:
+            return con.execute('SELECT 1 FROM firmware WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def get(self, digest):
+        '''
+        Return (data, kind) of a stored file, None if there is none.
+        '''
+        with closing(self.connect()) as con, con:
+            row = con.execute('SELECT data, kind FROM firmware WHERE digest = ?', (digest,)).fetchone()
+            if row is None:
+                return None
+            con.execute('UPDATE firmware SET used = ? WHERE digest = ?', (time.time(), digest))
+        return bytes(row[0]), row[1]
+
+    def put(self, data, kind):
+        '''
+        Store data, return its digest.
+        '''
+        digest = self.digest(data)
+        if len(data) > self.max_bytes:
+            return digest
+
+        with closing(self.connect()) as con, con:
+            if con.execute('UPDATE firmware SET used = ? WHERE digest = ?', (time.time(), digest)).rowcount:
+                return digest
+            con.execute('INSERT INTO firmware VALUES (?, ?, ?, ?, ?)',
+                        (digest, bytes(data), len(data), time.time(), kind))
+            total = con.execute('SELECT TOTAL(size) FROM firmware').fetchone()[0]
+            rows = con.execute('SELECT digest, size FROM firmware ORDER BY used').fetchall() \
+                if total > self.max_bytes else []
+            evict = []
+            for old, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evict.append((old,))
+                total -= size
+            con.executemany('DELETE FROM firmware WHERE digest = ?', evict)
+        return digest
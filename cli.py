@@ -113,23 +113,19 @@ if __name__ == "__main__":
         if k not in args.patches.split(",") and args.patches != 'all':
             continue
         try:
-            for desc, ofs, pre, post in patches[k]():
-                print(desc, ofs)
-                print("<<", pre)
-                print(">>", post)
-                pre_dis = [' '.join([x.bytes.hex(), x.mnemonic, x.op_str])
-                           for x in vlt.cs.disasm(bytes.fromhex(pre), 0)]
-                post_dis = [' '.join([x.bytes.hex(), x.mnemonic, x.op_str])
-                            for x in vlt.cs.disasm(bytes.fromhex(post), 0)]
-                for pd in pre_dis:
+            for rec in patches[k]():
+                print(rec.name, hex(rec.ofs))
+                print("<<", rec.pre.hex())
+                print(">>", rec.post.hex())
+                for pd in rec.disasm('pre'):
                     print("<", pd)
-                for pd in post_dis:
+                for pd in rec.disasm('post'):
                     print(">", pd)
         except SignatureException:
             print("SIGERR", k)
 
     with open(args.outfile, 'wb') as fp:
         if args.outfile.endswith(".zip"):
-            fp.write(Zippy(vlt.data).zip_it("ilike".encode()))
+            fp.write(Zippy(bytes(vlt.data)).zip_it("ilike".encode()))
         else:
-            fp.write(vlt.data)
+            fp.write(bytes(vlt.data))
@@ -0,0 +1,170 @@
+import hashlib
+import sqlite3
+from contextlib import closing
+from functools import lru_cache
+
+from layout import FirmwareLayout
+from mi_patcher import MiPatcher
+from nb_patcher import NbPatcher
+from util import MultiPattern
+
+FAMILIES = {'mi': MiPatcher, 'nb': NbPatcher}
+
+
+def StableDigest(data, layout=None):
+    '''
+    md5 of vector table and code with the id block blanked, unaffected by embedded keys / rand codes.
+    '''
+    layout = layout or FirmwareLayout(data)
+    lo, hi = layout.region('vectors')[0], layout.region('code')[1]
+    id_lo, id_hi = layout.regions.get('id', (hi, hi))
+    id_lo, id_hi = min(max(id_lo, lo), hi), max(min(id_hi, hi), lo)
+    view, md5 = memoryview(data), hashlib.md5()
+    md5.update(view[lo:id_lo])
+    md5.update(bytes(id_hi - id_lo))
+    md5.update(view[id_hi:hi])
+    return md5.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _markers():
+    # (family, drv) -> signatures, all of them matched in one pass
+    markers = {(family, drv): [tuple(sig) for sig in sigs]
+               for family, cls in FAMILIES.items() for drv, sigs in cls.drv_signatures.items()}
+    keys = tuple(dict.fromkeys(sig for sigs in markers.values() for sig in sigs))
+    return markers, keys, MultiPattern(keys)
+
+
+class Fingerprint():
+    '''
+    Identification of a DRV image: family (mi/nb), models and DRV version.
+    Known stock images are looked up in the database by exact and stable digest,
+    anything else is told apart by its encryption id and the DRV signatures of the patchers.
+    source is where the result came from: 'database', 'signatures' or None when nothing matched.
+    exact is only set for a stock image matched by its md5, the only case its DRV can be relied on.
+    '''
+    def __init__(self, data, db=None):
+        data = bytes(data)
+        self.layout = FirmwareLayout(data)
+        self.md5 = hashlib.md5(data).hexdigest()
+        self.stable = StableDigest(data, self.layout)
+        self.family = self.drv = self.name = self.source = None
+        self.models = []
+        self.exact = False
+
+        entry = db.lookup(self.md5, self.stable) if db is not None else None
+        if entry is not None:
+            self.family, self.models, self.drv, self.name, md5 = entry
+            self.source = 'database'
+            self.exact = md5 == self.md5
+            return
+        self._guess(data)
+
+    def _guess(self, data):
+        if self.layout.enc_id is not None:
+            self.family = 'nb'
+
+        # a DRV needs most of its signatures, a tie between two is no answer
+        markers, keys, matcher = _markers()
+        found = {key: bool(ofs) for key, ofs in zip(keys, matcher.scan(data))}
+        best, best_score = None, 0.5
+        for (family, drv), sigs in markers.items():
+            if self.family not in (None, family):
+                continue
+            score = sum(found[sig] for sig in sigs) / len(sigs)
+            if score > best_score:
+                best, best_score = (family, drv), score
+            elif score == best_score:
+                best = None
+        if best is not None:
+            self.family, self.drv = best
+        if self.family is not None:
+            self.source = 'signatures'
+
+    def matches(self, family, model):
+        '''
+        False if the image is known not to be for this family / model.
+        '''
+        return self.family in (None, family) and (not self.models or model in self.models)
+
+    def __str__(self):
+        if self.source is None:
+            return 'an unknown firmware'
+        desc = self.name or ' '.join(filter(None, [self.family, '/'.join(self.models), self.drv and f'DRV {self.drv}']))
+        return f'{desc} ({self.source})'
+
+    def as_dict(self):
+        return {'family': self.family, 'models': self.models, 'drv': self.drv, 'name': self.name,
+                'source': self.source, 'exact': self.exact, 'md5': self.md5, 'stable': self.stable}
+
+
+class FingerprintDB():
+    '''
+    Local database of known stock images by md5, the stable digest catches copies
+    that only differ in the id block.
+    '''
+    def __init__(self, path):
+        self.path = str(path)
+        with closing(self.connect()) as con, con:
+            con.execute('CREATE TABLE IF NOT EXISTS images('
+                        'md5 TEXT PRIMARY KEY, stable TEXT, family TEXT, models TEXT, drv TEXT, name TEXT)')
+            con.execute('CREATE INDEX IF NOT EXISTS images_stable ON images(stable)')
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, data, family, models, drv=None, name=None):
+        assert family in FAMILIES, family
+        data = bytes(data)
+        row = (hashlib.md5(data).hexdigest(), StableDigest(data), family, ','.join(models), drv, name)
+        with closing(self.connect()) as con, con:
+            con.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)', row)
+        return row[0]
+
+    def digest(self):
+        '''
+        md5 over all known images, changes whenever one is added or replaced.
+        '''
+        md5 = hashlib.md5()
+        with closing(self.connect()) as con, con:
+            for row in con.execute('SELECT md5, stable, family, models, drv, name FROM images ORDER BY md5'):
+                md5.update(repr(row).encode())
+        return md5.hexdigest()
+
+    def lookup(self, md5, stable):
+        '''
+        Return (family, models, drv, name, md5) of a known image, None if there is none.
+        '''
+        with closing(self.connect()) as con, con:
+            row = con.execute('SELECT family, models, drv, name, md5 FROM images WHERE md5 = ?', (md5,)).fetchone() \
+                or con.execute('SELECT family, models, drv, name, md5 FROM images WHERE stable = ?', (stable,)).fetchone()
+        if row is None:
+            return None
+        family, models, drv, name, md5 = row
+        return family, models.split(',') if models else [], drv, name, md5
+
+
+if __name__ == "__main__":
+    import json
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument("--db", default="fingerprints.db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    show = sub.add_parser("show", help="identify a firmware")
+    show.add_argument("infile")
+    add = sub.add_parser("add", help="register a stock firmware")
+    add.add_argument("infile")
+    add.add_argument("family", choices=list(FAMILIES))
+    add.add_argument("models", help="comma separated, e.g. 1s,pro2,lite")
+    add.add_argument("--drv")
+    add.add_argument("--name")
+    args = parser.parse_args()
+
+    with open(args.infile, 'rb') as fp:
+        data = fp.read()
+    db = FingerprintDB(args.db)
+    if args.cmd == "add":
+        print(db.add(data, args.family, args.models.split(','), drv=args.drv, name=args.name))
+    else:
+        print(json.dumps(Fingerprint(data, db).as_dict(), indent=2))
@@ -0,0 +1,187 @@
+from bisect import bisect_right
+
+from buffers import STATS, Copy
+from util import PatchConflictException
+
+COMMITTED = None
+
+
+class PatchedImage():
+    '''
+    Copy-on-write firmware image: the read-only original plus a sparse overlay of writes.
+    The overlay is split into layers, one per mod. Reads see the original, the committed
+    layer and the active layer. Writes overlapping another layer's writes raise
+    PatchConflictException unless they agree on the bytes.
+    Every change of the visible bytes is logged as a (start, stop) range in writes.
+    '''
+    def __init__(self, original):
+        self.original = original if isinstance(original, bytes) else Copy(original)
+        self.layers = {COMMITTED: ([], [])}
+        self.active = COMMITTED
+        self.writes = []
+        self._view = None
+
+    def __len__(self):
+        return len(self.original)
+
+    def __bytes__(self):
+        return bytes(self.view())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self.original))
+            if step != 1:
+                return bytearray(self.view()[key])
+            return self._read(start, stop)
+        if key < 0:
+            key += len(self.original)
+        return self._read(key, key + 1)[0]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self.original))
+            assert step == 1, 'extended slices are not supported!'
+        else:
+            start = key % len(self.original)
+            stop, value = start + 1, [value]
+        value = bytes(value)
+        if len(value) != max(stop - start, 0):
+            raise ValueError(f'write at {hex(start)} would change the image size')
+        if not value:
+            return
+
+        for name, layer in self.layers.items():
+            if name not in (COMMITTED, self.active):
+                self._check(layer, name, start, value)
+        self._write(self.layers[self.active], start, value)
+        self._changed(start, stop)
+
+    def view(self):
+        '''
+        The visible image, the original itself as long as nothing visible was written.
+        '''
+        if self._view is None:
+            spans = self._visible()
+            if not spans:
+                return self.original
+            self._view = self._render(spans)
+            STATS.count(len(self._view))
+        return self._view
+
+    def begin(self, name):
+        '''Make name the active layer, later writes go there.'''
+        self.end()
+        self.layers.setdefault(name, ([], []))
+        self.active = name
+        self._changed_layer(name)
+
+    def end(self):
+        '''Back to the committed layer, the active layer's writes are kept but hidden.'''
+        name, self.active = self.active, COMMITTED
+        if name is not COMMITTED:
+            self._changed_layer(name)
+
+    def drop(self, name):
+        '''Roll back all writes of a layer.'''
+        if self.active == name:
+            self.end()
+        self.layers.pop(name, None)
+
+    def commit(self, names=None):
+        '''Merge layers (default: all) into the committed layer.'''
+        self.end()
+        names = [n for n in self.layers if n is not COMMITTED] if names is None else names
+        base = self.layers[COMMITTED]
+        for name in names:
+            starts, bufs = self.layers.pop(name)
+            for start, buf in zip(starts, bufs):
+                self._write(base, start, bytes(buf))
+                self._changed(start, start + len(buf))
+
+    def diff(self, name=COMMITTED):
+        '''Return the (offset, original bytes, new bytes) spans of a layer.'''
+        starts, bufs = self.layers[name]
+        return [(start, self.original[start:start + len(buf)], bytes(buf)) for start, buf in zip(starts, bufs)]
+
+    def _visible(self):
+        spans = list(zip(*self.layers[COMMITTED]))
+        if self.active is not COMMITTED:
+            spans += zip(*self.layers[self.active])
+        return spans
+
+    def _render(self, spans):
+        # the original between the overlay spans, joined into the one new buffer
+        ordered = sorted(spans, key=lambda span: span[0])
+        if any(a + len(buf) > b for (a, buf), (b, _) in zip(ordered, ordered[1:])):
+            # active and committed layer overlap, merge them into disjoint spans with the active one on top
+            merged = ([], [])
+            for start, buf in spans:
+                self._write(merged, start, buf)
+            ordered = list(zip(*merged))
+
+        original, pieces, pos = memoryview(self.original), [], 0
+        for start, buf in ordered:
+            pieces += [original[pos:start], buf]
+            pos = start + len(buf)
+        pieces.append(original[pos:])
+        return b''.join(pieces)
+
+    def _changed(self, start, stop):
+        self._view = None
+        self.writes.append((start, stop))
+
+    def _changed_layer(self, name):
+        for start, buf in zip(*self.layers.get(name, ([], []))):
+            self._changed(start, start + len(buf))
+
+    def _read(self, start, stop):
+        out = bytearray(self.original[start:stop])
+        layers = [self.layers[COMMITTED]]
+        if self.active is not COMMITTED:
+            layers.append(self.layers[self.active])
+        for starts, bufs in layers:
+            for i in range(max(bisect_right(starts, start) - 1, 0), len(starts)):
+                s = starts[i]
+                if s >= stop:
+                    break
+                buf = bufs[i]
+                lo, hi = max(s, start), min(s + len(buf), stop)
+                if lo < hi:
+                    out[lo - start:hi - start] = buf[lo - s:hi - s]
+        return out
+
+    def _check(self, layer, name, start, value):
+        starts, bufs = layer
+        stop = start + len(value)
+        for i in range(max(bisect_right(starts, start) - 1, 0), len(starts)):
+            s = starts[i]
+            if s >= stop:
+                break
+            buf = bufs[i]
+            lo, hi = max(s, start), min(s + len(buf), stop)
+            if lo < hi and buf[lo - s:hi - s] != value[lo - start:hi - start]:
+                raise PatchConflictException(f'{self.active} and {name} patch the same bytes at {hex(lo)}')
+
+    def _write(self, layer, start, value):
+        # merge with every span it overlaps or touches, spans stay sorted and disjoint
+        starts, bufs = layer
+        stop = start + len(value)
+        i = bisect_right(starts, start)
+        if i and starts[i - 1] + len(bufs[i - 1]) >= start:
+            i -= 1
+        j = i
+        while j < len(starts) and starts[j] <= stop:
+            j += 1
+        if i == j:
+            starts.insert(i, start)
+            bufs.insert(i, bytearray(value))
+            return
+
+        lo = min(start, starts[i])
+        hi = max(stop, starts[j - 1] + len(bufs[j - 1]))
+        merged = bytearray(hi - lo)
+        for s, buf in zip(starts[i:j], bufs[i:j]):
+            merged[s - lo:s - lo + len(buf)] = buf
+        merged[start - lo:stop - lo] = value
+        starts[i:j] = [lo]
+        bufs[i:j] = [merged]
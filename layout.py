@@ -0,0 +1,149 @@
+import struct
+
+SRAM = (0x20000000, 0x20100000)
+FLASH = (0x08000000, 0x08200000)
+
+# encryption data (key, rand code, scooter id) of ninebot DRVs
+ENC_DATA_OFS = 0x400
+ENC_DATA_LEN = 0x40
+ENC_IDS = [
+    b'NineBotScooter',
+    b'SCOOTER_VCU_xxU2',
+    b'SCOOTER_VCU_xxG3',
+    b'SCOOTER_VCU_xxF3'
+]
+
+
+def _in(addr, area):
+    return area[0] <= addr < area[1]
+
+
+def _is_entry(hw, hw2):
+    # typical first instruction of a handler / function
+    return (hw & 0xfe00) == 0xb400 \
+        or hw == 0xe92d \
+        or hw == 0xe7fe \
+        or hw == 0x4770 \
+        or (hw & 0xf800) == 0x4800 \
+        or ((hw & 0xf800) == 0xf000 and (hw2 & 0xd000) == 0xd000)
+
+
+def HeaderValid(data):
+    '''
+    Whether data starts with a plausible vector table: initial SP in SRAM, thumb reset handler in flash.
+    '''
+    sp, reset = struct.unpack_from('<LL', data) if len(data) >= 8 else (0, 0)
+    return bool(_in(sp, SRAM) and _in(reset, FLASH) and reset & 1)
+
+
+def EncId(data):
+    '''
+    Scooter id of the encryption data block of ninebot DRVs, None if there is none.
+    '''
+    raw = bytes(data[ENC_DATA_OFS:ENC_DATA_OFS + 16])
+    null_pos = raw.find(b'\x00')
+    enc_id = raw[:null_pos] if null_pos != -1 else raw
+    return enc_id if enc_id in ENC_IDS else None
+
+
+class FirmwareLayout():
+    '''
+    Section map of a Cortex-M DRV image, derived from the vector table at its start.
+    All offsets are file offsets, regions are (start, stop) tuples.
+    When the image does not start with a plausible vector table every region
+    covers the whole image.
+    '''
+    def __init__(self, data):
+        self.size = len(data)
+        self.sp, self.reset = struct.unpack_from('<LL', data) if len(data) >= 8 else (0, 0)
+        self.valid = HeaderValid(data)
+
+        self.vectors = []
+        self.base = self.reset_ofs = None
+        self.literals = []
+        self.enc_id = EncId(data)
+
+        whole = (0, self.size)
+        self.regions = {name: whole for name in ['vectors', 'code', 'data']}
+        if self.enc_id is not None:
+            self.regions['id'] = (ENC_DATA_OFS, ENC_DATA_OFS + ENC_DATA_LEN)
+
+        if self.valid:
+            self.vectors = self._vectors(data)
+            self.base = self._base(data)
+        if self.base is None:
+            self.valid = False
+            return
+
+        self.reset_ofs = self.reset - 1 - self.base
+        vt_end = 4 * (len(self.vectors) + 1)
+        code_end = self._code_end(data, vt_end)
+        self.literals = self._literals(data, vt_end, code_end)
+        self.regions.update({
+            'vectors': (0, vt_end),
+            'code': (vt_end, code_end),
+            'data': (code_end, self.size),
+        })
+
+    def region(self, name):
+        return self.regions.get(name, (0, self.size))
+
+    def _vectors(self, data):
+        # reset handler onwards, reserved slots are 0, stop at the first non-handler
+        vectors = []
+        for (vec,) in struct.iter_unpack('<L', data[4:min(self.size, 0x400) & ~3]):
+            if vec != 0 and not (vec & 1 and abs(vec - self.reset) < self.size):
+                break
+            vectors.append(vec)
+        return vectors
+
+    def _base(self, data):
+        # load address: 0x80 aligned (VTOR), handlers have to land on function entries
+        vt_end = 4 * (len(self.vectors) + 1)
+        handlers = {vec - 1 for vec in self.vectors if vec}
+        lo = (max(handlers) - self.size + 0x80) & ~0x7f
+        hi = min(handlers) - vt_end
+
+        best, best_score = None, 0
+        for base in range(max(lo, FLASH[0]), hi + 1, 0x80):
+            score = 0
+            for h in handlers:
+                ofs = h - base
+                hw, hw2 = struct.unpack_from('<HH', data, ofs) if ofs + 4 <= self.size else (0, 0)
+                score += _is_entry(hw, hw2)
+            if score > best_score:
+                best, best_score = base, score
+        # most handlers must agree, otherwise this isn't a vector table
+        return best if best_score * 2 > len(handlers) else None
+
+    def _code_end(self, data, vt_end):
+        # behind the last function epilogue (BX LR / POP {..,PC}) and its literal pool
+        end = vt_end
+        for ofs in range((self.size - 2) & ~1, vt_end - 1, -2):
+            hw = data[ofs] | data[ofs + 1] << 8
+            if hw == 0x4770 or (hw & 0xff00) == 0xbd00:
+                end = ofs + 2
+                break
+        end = (end + 3) & ~3
+        while end + 4 <= self.size and self._is_literal(struct.unpack_from('<L', data, end)[0]):
+            end += 4
+        return min(end, self.size)
+
+    def _is_literal(self, word):
+        return _in(word, SRAM) \
+            or self.base <= word < self.base + self.size \
+            or _in(word, (0x40000000, 0x60000000))  # peripherals
+
+    def _literals(self, data, start, stop):
+        # runs of word aligned pointers inside the code region
+        literals = []
+        start = (start + 3) & ~3
+        for i, (word,) in enumerate(struct.iter_unpack('<L', data[start:stop & ~3])):
+            ofs = start + 4 * i
+            if not self._is_literal(word):
+                continue
+            if literals and literals[-1][1] == ofs:
+                literals[-1] = (literals[-1][0], ofs + 4)
+            else:
+                literals.append((ofs, ofs + 4))
+        return literals
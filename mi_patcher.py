@@ -1,62 +1,253 @@
 import struct
 
-from base_patcher import BasePatcher
-from util import PatchImm, FindPattern, NearestConst, SignatureException
-
-# https://web.eecs.umich.edu/~prabal/teaching/eecs373-f10/readings/ARMv7-M_ARM.pdf
-MOVW_T3_IMM = [*[None]*5, 11, *[None]*6, 15, 14, 13, 12, None, 10, 9, 8, *[None]*4, 7, 6, 5, 4, 3, 2, 1, 0]
-MOVS_T1_IMM = [*[None]*8, 7, 6, 5, 4, 3, 2, 1, 0]
+from base_patcher import Assemble, BasePatcher, PatchRecord, signatures
+from thumb import MOVS_T1_IMM, MOVW_T3_IMM, ModImm, NearestConst
+from util import PatchImm, PatchImms, SignatureException
+
+SIG_MODELLOCK = [0x01, 0xeb, 0x00, 0x0c, 0x13, 0xf8, 0x00, 0x80, 0x9c, 0xf8, 0x04, 0xc0,
+                 0xc4, 0x45]
+SIG_MODELLOCK_016 = [None, 0x18, None, 0xf8, 0x00, 0xc0, None, 0x79, None, 0x45]
+SIG_KERS = [0x00, 0xeb, 0x80, 0x00, 0x80, 0x00, 0x80, 0x0a]
+SIG_KERS_022 = [0x00, 0xdd, 0x80, 0x20, 0xc0, 0x04, 0x00, 0x0c]
+SIG_AUTOBRAKE = [None, 0x68, 0x42, 0xf6, 0x6e, 0x0c]
+SIG_AUTOBRAKE_022 = [0x2C, 0xE0, 0x18, 0x68, 0x42, 0xF6, 0xD0, 0x7b]
+SIG_CHARGING = [0xF8, 0x12, 0x00, 0x20, 0xB1, None, 0xF8, 0x3A, None, None, 0x7b]
+SIG_SPEED = [0x95, 0xf8, 0x34, None, None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
+SIG_SPEED_242 = [0x85, 0xf8, 0x40, 0x60, 0x95, 0xf8, 0x34, 0x30]
+SIG_SPEED_016 = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
+SIG_CRC_022 = [0x95, 0xf8, 0x34, 0xc0, 0x4f, 0xf4, 0x96, 0x73]
+SIG_SL_DRIVE_242 = [0xa1, 0x85, 0x0f, 0x20, 0x20, 0x84]
+SIG_SL_DRIVE_022 = [0x59, 0x00, 0x14, 0x22, 0x46]
+SIG_SL_SPORT_022 = [0x4f, 0xf0, 0x19, 0x0e, 0x4f, 0xf0, 0x05, 0x09]
+SIG_SL_PED = [0x4f, 0xf0, 0x05, None, 0x01, None, 0x02, 0xd1]
+SIG_SL_PED_022 = [0x4f, 0xf0, 0x05, 0x09, 0xbc, 0xf1, 0x01, 0x0f]
+SIG_MSS = [0x01, 0x68, 0x40, 0xF2, 0xBD, 0x62]
+SIG_MSS_022 = [0x01, 0x08, 0xb1, 0xf5, 0xff, 0x6f]
+SIG_WSC = [0xB4, 0xF9, None, 0x00, 0x40, 0xF2, 0x59, 0x11, 0x48, 0x43]
+SIG_WSC_OTHER = [0x60, 0x60, 0x60, 0x68, 0x40, 0xF2, 0x6B, 0x51, 0x48, 0x43]
+SIG_WSC_022 = [0xA4, 0xF8, 0x4A, 0x50, 0x6F, 0xF4, 0xCC, 0x70]
+SIG_WSC_OTHER_022_0 = [0xBD, 0xF9, 0x24, 0x50, 0x40, 0xF2, 0xEE, 0x66]
+SIG_WSC_OTHER_022_1 = [0xBD, 0xF9, 0x24, 0x60, 0x40, 0xF2, 0xEE, 0x67]
+SIG_AMP_SPORT_NOP = [0x13, 0xD2, None, 0x85, None, 0xE0, None, 0x8E]
+SIG_AMP_SPORT_NOP_242 = [0x88, 0x42, 0x01, 0xd2, 0xa0, 0x85, 0x00, 0xe0]
+SIG_AMP_SPORT_NOP_016 = [0x98, 0x42, 0x01, 0xd2, 0xe0, 0x85, 0x00, 0xe0]
+SIG_AMP_SPORT_NOP_022 = [0x60, 0x86, 0x2d, 0xe0, 0x58, 0x45, 0x01, 0xd2]
+SIG_AMP_SPORT = [None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
+SIG_AMP_SPORT_022 = [0x59, 0x00, None, 0x22, 0x46, 0xf2, 0x84, 0x7b]
+SIG_AMP_DRIVE = [0x95, 0xf8, 0x40, None, 0x01, None, 0x06, 0xd0, None, 0x8e]
+SIG_AMP_DRIVE_016 = [0x95, 0xf8, 0x40, 0xc0, 0xbc, 0xf1, 0x01, 0x0f, 0x05, 0xd0]
+SIG_AMP_DRIVE_NOP_242 = [0x88, 0x42, 0x09, 0xd2, 0xa0, 0x85, 0x08, 0xe0]
+SIG_AMP_PED = [None, None, 0x41, 0xf6, 0x58, None, None, None, 0x01, 0xd2]
+SIG_AMP_MAX_PED = [0xa4, 0xf8, None, None, 0x4f, 0xf4, 0xfa]
+SIG_AMP_MAX = [0x02, 0xd0, 0xa4, 0xf8, 0x22, 0x80, None, 0xe0, 0x61, 0x84, None, 0xe0]
+SIG_AMP_MAX_SPORT_242 = [0x95, 0xf8, 0x34, 0x80, 0x4f, 0xf4, 0xfa, 0x43]
+SIG_AMP_MAX_DRIVE_016 = [0x95, 0xf8, 0x43, 0xc0, 0x46, 0xf6, 0x60, 0x50]
+SIG_AMP_MAX_SPORT_016 = [0x95, 0xf8, 0x43, 0xc0, 0x4d, 0xf2, 0xd8, 0x60]
+SIG_AMP_MAX_DRIVE_022 = [0x95, 0xf8, 0x41, 0x00, 0x48, 0xf6, 0xb8, 0x0c]
+SIG_AMP_MAX_SPORT_022 = [0x95, 0xf8, 0x41, 0x30, 0x4d, 0xf2, 0xd8, 0x60]
+SIG_DPC = [0x00, 0x21, 0xa1, 0x71, 0xa2, 0xf8, 0xec, 0x10, 0x63, 0x79]
+SIG_DPC_022 = [0xdf, 0xf8, 0x28, 0x91, 0xa9, 0xf8, 0xec, 0x70, 0x69, 0x79]
+SIG_DPC_RESET = [0xf8, 0xe2, None, None, 0xf8, 0xf0, None, None, 0xf8, 0xee, None]
+SIG_SHUTDOWN = [0xb0, 0xf5, 0xfa, 0x7f, 0x08, 0xd9, None, 0x79, 0x30, 0xb9]
+SIG_PNB = [0x01, 0x29, None, 0xd0, 0xa1, 0x79, None, 0x29, None, 0xd0, 0x90, 0xf8,
+           0x34, 0x10, None, 0x29]
+SIG_PNB2 = [0x89, 0x07, 0x02, 0xd5, 0x90, 0xf8, None, 0x10, 0x19, 0xb3, 0x90, 0xf8,
+            0x34, 0x00, 0x01, 0x28]
+SIG_BLM_THROTTLE = [0x01, 0x29, None, 0xd0, 0xa1, 0x79, 0x01, 0x29]
+SIG_BLM_GLOB = [0x90, 0xf8, None, None, 0x00, 0x28, None, 0xd1]
+SIG_BLM_ADDR_1 = [0x10, 0xbd, 0x00, 0x00, None, 0x04, 0x00, 0x20, 0x70, 0xb5]
+SIG_BLM_ADDR_2 = [None, 0x00, 0x00, 0x20, None, 0x06, 0x00, 0x20, None, 0x03, 0x00, 0x20]
+SIG_BLM = [0x90, 0xf8, None, None, None, 0x28, None, 0xd1]
+SIG_BLM_242 = [0xa0, 0x7d, 0x40, 0x1c, 0xc0, 0xb2, 0xa0, 0x75]
+SIG_RFM_1 = Assemble('STRB.W R2,[R1,#0x43]')
+SIG_RFM_2 = Assemble('STRB R2,[R1,#0x1e]')
+SIG_RFM_3 = Assemble('STRB.W R2,[R1,#0x41]')
+SIG_RFM_FLAGS_022 = [Assemble(f"STRB.W R7,[R6,#{f_ofs}]") for f_ofs in [0x3e, 0x41, 0x43, 0x44, 0x45]]
+SIG_RFM_CC_022 = Assemble("STRH.W r8,[r5,#0xee]")
+SIG_LOWER_LIGHT = [0x4f, 0xf0, 0x80, 0x40, 0x04, 0xf0, None, None, 0x20, 0x88]
+SIG_AMPERE_METER = [None, 0x79, None, 0x49, 0x10, 0xb9, 0xfd, 0xf7, None, None, 0x48, 0x70]
+SIG_CC_DELAY = [0xb0, 0xf8, 0xf8, 0x10, None, 0x4b, 0x4f, 0xf4, 0x7a, 0x70]
+SIG_CC_DELAY_022 = [0xf8, 0x00, 0x89, 0x46, 0x60, 0x4b, 0x4f, 0xf4, 0x7a, 0x71]
+SIG_LEVER_RES = bytes.fromhex("732800dd7320")
+SIG_BAUDRATE = [0x00, 0xf0, 0xe6, 0xf8, 0x00, 0x21, 0x4f, 0xf4, 0xe1, 0x30]
+SIG_BAUDRATE_022 = [0x20, 0x46, 0x00, 0xf0, 0xa6, 0xfa, 0x4f, 0xf4, 0xe1, 0x30]
+SIG_VOLT_LIMIT = [0x40, 0xF2, 0xA5, 0x61, 0xA0, 0xF6, 0x28, 0x20, 0x88, 0x42]
+SIG_VOLT_LIMIT_022 = [0x40, 0xf2, 0xa5, 0x61, 0x88, 0x42, 0x04, 0xd3, 0x18, 0x20]
+SIG_BTS_DAT = [None, 0x00, 0x00, 0x20, 0x10, 0xb5, 0x00, 0x23, 0x1a, 0x46, 0x03, 0xe0]
+SIG_BTS_LIGHT = [0x22, 0x71, 0x22, 0x81, 0xb8, 0x78, 0x10, 0xb1, 0xba, 0x70, 0x2a, 0x72,
+                 0x37, 0xe0, 0x64, 0x20, 0xb8, 0x70, 0x2e, 0x72, 0x33, 0xe0]
+SIG_BTS_MODE = [0x22, 0x71, 0x22, 0x81, 0x01, 0x78, 0x21, 0xb1, 0x01, 0x29, 0x07, 0xd0,
+                0x02, 0x29, 0x10, 0xd1, 0x0a, 0xe0, 0x02, 0x21, 0x01, 0x70, 0x85, 0xf8,
+                0x3d, 0x60, 0x02, 0xe0, 0x02, 0x70, 0x85, 0xf8, 0x3d, 0x20, 0x85, 0xf8,
+                0x3c, 0x20, 0x04, 0xe0, 0x06, 0x70, 0x85, 0xf8, 0x3d, 0x20, 0x85, 0xf8,
+                0x3c, 0x60, 0x22, 0x70, 0xe2, 0x80]
+SIG_FAKE_UID = [0xfd, 0xf7, None, None, None, 0x48, 0xb0, 0xf9, 0x00, 0x10, 0xb4, 0xf9,
+                0xb4, 0x21, 0x91, 0x42]
+SIG_ABR = [0x00, 0xdd, 0x73, 0x20, None, None, None, None, 0x50, 0x43, 0x73, 0x22,
+           0x90, 0xfb, 0xf2, 0xf0, None, None, 0x10, 0x1a]
+SIG_ABR_MIN_022 = [0xf2, 0xf0, None, None, 0x10, 0x1a, 0xa0, 0xf5, 0xfa, 0x50]
+SIG_KERS_MULTI = [0x00, 0xeb, 0x40, 0x00, 0x40, 0x00, 0x05, 0xe0, 0x00, 0xeb, 0x40, 0x00,
+                  0x01, 0xe0, 0x00, 0xeb, 0x80, 0x00, 0x80, 0x00]
+SIG_KERS_MULTI_022 = [0x00, 0xeb, 0x40, 0x00, 0xc0, 0xf3, 0x55, 0x20, 0x20, 0x86, 0x0a, 0xe0,
+                      0x00, 0xeb, 0x40, 0x00, 0xc0, 0xf3, 0x15, 0x20, 0x20, 0x86, 0x04, 0xe0,
+                      0x00, 0xeb, 0x80, 0x00, 0xc0, 0xf3, 0x15, 0x20]
+
+
+# (signature, offset, register, *required signatures) variants, in order of priority
+MODELLOCK_VARIANTS = [
+    (SIG_MODELLOCK, len(SIG_MODELLOCK), None),  # 017
+    (SIG_MODELLOCK_016, len(SIG_MODELLOCK_016), None),  # 016 / 252 / 245
+]
+KERS_VARIANTS = [
+    (SIG_KERS, 6, None),
+    (SIG_KERS_022, 6, None),  # 022
+]
+AUTOBRAKE_VARIANTS = [
+    (SIG_AUTOBRAKE, 2, 12),
+    (SIG_AUTOBRAKE_022, 4, 11),  # 022
+]
+# TODO: all trying to find same position
+CRC_VARIANTS = [
+    (SIG_SPEED, 6, 0),
+    (SIG_SPEED_242, 0x8, 2),  # 242
+    (SIG_SPEED_016, 0xa, 1),  # 016
+    (SIG_CRC_022, 4, 3),  # 022
+]
+SL_DRIVE_VARIANTS = [
+    (SIG_SPEED, 4, 1),
+    (SIG_SPEED_016, 0x8, 2),  # 016
+    (SIG_SL_DRIVE_242, 2, 0),  # 242
+    (SIG_SL_DRIVE_022, 2, 2),  # 022
+]
+SL_SPORT_VARIANTS = [
+    (SIG_SPEED, 0xe, 8),  # for 319 this moved to the top and 'movs' became 'mov.w'
+    (SIG_SPEED_242, 0xc, 12),  # 242
+    (SIG_SPEED_016, 0x12, 8),  # 016
+    (SIG_SL_SPORT_022, 0, 14),  # 022
+]
+SL_PED_VARIANTS = [
+    (SIG_SL_PED, 0, None),
+    (SIG_SPEED_016, 0x16, None),  # 016
+    (SIG_SL_PED_022, 0, None),  # 022
+]
+AMP_SPORT_NOP_VARIANTS = [
+    (SIG_AMP_SPORT_NOP, 8, None),
+    (SIG_AMP_SPORT_NOP_242, 0, None),  # 242
+    (SIG_AMP_SPORT_NOP_016, 0, None),  # 016
+    (SIG_AMP_SPORT_NOP_022, 4, None),  # 022
+]
+AMP_SPORT_VARIANTS = [
+    (SIG_AMP_SPORT, 6, None),
+    (SIG_SPEED_242, 0x10, None),  # 242
+    (SIG_SPEED_016, 0xe, None),  # 016
+    (SIG_AMP_SPORT_022, 4, None),  # 022
+]
+DPC_VARIANTS = [
+    (SIG_DPC, 4, None),
+    (SIG_DPC_022, 4, None),  # 022
+]
+CC_DELAY_VARIANTS = [
+    (SIG_CC_DELAY, 6, 0),
+    (SIG_CC_DELAY_022, 6, 1),  # 022
+]
+BAUDRATE_VARIANTS = [
+    (SIG_BAUDRATE, 6, None),
+    (SIG_BAUDRATE_022, 6, None),  # 022
+]
+VOLT_LIMIT_VARIANTS = [
+    (SIG_VOLT_LIMIT, 0, None),
+    (SIG_VOLT_LIMIT_022, 0, None),  # 022
+]
+# variants patched differently per DRV carry the DRV (or the register of the
+# instruction that is rewritten) instead of the register of a MOVW
+MSS_VARIANTS = [
+    (SIG_MSS, 2, None),
+    (SIG_MSS_022, 2, 1),  # 022: CMP.W R1
+]
+WSC_VARIANTS = [
+    (SIG_WSC, 4, None, SIG_WSC_OTHER),
+    (SIG_WSC_022, 4, '022', SIG_WSC_OTHER_022_0, SIG_WSC_OTHER_022_1),
+]
+AMP_DRIVE_VARIANTS = [
+    (SIG_AMP_DRIVE, 0xa, None),
+    (SIG_AMP_DRIVE_016, len(SIG_AMP_DRIVE_016), None),  # 016
+    (SIG_AMP_DRIVE_NOP_242, 0, 'nop'),  # 242: drive has same amps as speed, only the check is left
+]
+AMP_MAX_VARIANTS = [
+    (SIG_AMP_MAX, 0, None),  # 247 / 319
+    (SIG_AMP_MAX_SPORT_242, 4, '242'),
+    (SIG_AMP_MAX_DRIVE_016, 4, '016', SIG_AMP_MAX_SPORT_016),
+    (SIG_AMP_MAX_DRIVE_022, 4, '022', SIG_AMP_MAX_SPORT_022),
+]
+AMP_MAX_SPORT = {
+    '016': SIG_AMP_MAX_SPORT_016,
+    '022': SIG_AMP_MAX_SPORT_022,
+}
+RFM_VARIANTS = [
+    (SIG_RFM_1, 0, None, SIG_RFM_2, SIG_RFM_3),
+    (SIG_RFM_FLAGS_022[0], 0, '022', *SIG_RFM_FLAGS_022[1:], SIG_RFM_CC_022),
+]
+ABR_MIN_VARIANTS = [
+    (SIG_ABR_MIN_022, 6, None),  # 022
+    (SIG_ABR, 4 + 18, None),
+]
+KERS_MULTI_VARIANTS = [
+    (SIG_KERS_MULTI, 0, None),
+    (SIG_KERS_MULTI_022, 0, '022'),
+]
+
+# signatures only found in one DRV line, they identify it (see fingerprint.py)
+# and its variants are tried first once it is known
+DRV_SIGNATURES = {
+    '016': [SIG_SPEED_016, SIG_AMP_SPORT_NOP_016, SIG_AMP_DRIVE_016, SIG_AMP_MAX_DRIVE_016, SIG_AMP_MAX_SPORT_016],
+    '022': [SIG_KERS_022, SIG_AUTOBRAKE_022, SIG_CRC_022, SIG_SL_SPORT_022, SIG_SL_PED_022, SIG_MSS_022,
+            SIG_WSC_022, SIG_AMP_SPORT_NOP_022, SIG_AMP_SPORT_022, SIG_DPC_022, SIG_CC_DELAY_022,
+            SIG_BAUDRATE_022, SIG_VOLT_LIMIT_022],
+    '242': [SIG_SPEED_242, SIG_SL_DRIVE_242, SIG_AMP_SPORT_NOP_242, SIG_AMP_DRIVE_NOP_242, SIG_AMP_MAX_SPORT_242,
+            SIG_BLM_242],
+}
 
 
 class MiPatcher(BasePatcher):
-    def __init__(self, data, model):
-        super().__init__(data, model)
-
-        self.defaults = {
-            "1s": {
-                "speed_limit_ped": 5,
-                "speed_limit_drive": 20,
-                "speed_limit_sport": 25,
-                "ampere_ped": 7000,
-                "ampere_drive": 15000,
-                "ampere_sport": 20000,
-                "ampere_ped_max": 8000,
-                "ampere_drive_max": 28000,
-                "ampere_sport_max": 35000,
-                "ampere_brake_min": 8000,
-                "ampere_brake_max": 52000,
-                "volt_limit": 43.01,
-                "current_raising_coeff": 300,
-                "motor_start_speed": 5.0,
-                "shutdown_time": 3.0,
-                "cc_delay": 5.0,
-                "wheel_speed_const": 1.0,
-                "wheel_size": 8.5
-            },
-            "pro2": {
-            },
-            "lite": {
-            },
-            "mi3": {
-            },
-            "4pro": {
-            }
+    drv_signatures = DRV_SIGNATURES
+    defaults = {
+        "1s": {
+            "speed_limit_ped": 5,
+            "speed_limit_drive": 20,
+            "speed_limit_sport": 25,
+            "ampere_ped": 7000,
+            "ampere_drive": 15000,
+            "ampere_sport": 20000,
+            "ampere_ped_max": 8000,
+            "ampere_drive_max": 28000,
+            "ampere_sport_max": 35000,
+            "ampere_brake_min": 8000,
+            "ampere_brake_max": 52000,
+            "volt_limit": 43.01,
+            "current_raising_coeff": 300,
+            "motor_start_speed": 5.0,
+            "shutdown_time": 3.0,
+            "cc_delay": 5.0,
+            "wheel_speed_const": 1.0,
+            "wheel_size": 8.5
+        },
+        "pro2": {
+        },
+        "lite": {
+        },
+        "mi3": {
+        },
+        "4pro": {
         }
+    }
 
+    @signatures(*MODELLOCK_VARIANTS)
     def remove_modellock(self):
         '''
         Creator/Author: Turbojeet
         Description: (New DRVs only) Removes the check that prevents cross-flashing DRV from another model
         '''
-        try:
-            # 017
-            sig = [0x01, 0xeb, 0x00, 0x0c, 0x13, 0xf8, 0x00, 0x80,
-                   0x9c, 0xf8, 0x04, 0xc0, 0xc4, 0x45]
-            ofs = FindPattern(self.data, sig) + len(sig)
-        except SignatureException:
-            # 016 / 252 / 245
-            sig = [None, 0x18, None, 0xf8, 0x00, 0xc0, None, 0x79, None, 0x45]
-            ofs = FindPattern(self.data, sig) + len(sig)
+        ofs, _ = self.resolve(MODELLOCK_VARIANTS)
 
         pre = self.data[ofs:ofs+2]
         post = pre.copy()
@@ -64,89 +255,59 @@ class MiPatcher(BasePatcher):
             raise Exception(f"invalid firmware file: {pre.hex()}")
         post[-1] = 0xe0
         self.data[ofs:ofs+2] = post
-        return [("no_modellock", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("no_modellock", ofs, pre, post)]
 
+    @signatures(*KERS_VARIANTS)
     def remove_kers(self):
         '''
         Creator/Author: Turbojeet
         Description: Alternate (improved) version of No Kers Mod
         '''
-        try:
-            sig = [0x00, 0xeb, 0x80, 0x00, 0x80, 0x00, 0x80, 0x0a]
-            ofs = FindPattern(self.data, sig) + 6
-        except SignatureException:
-            # 022
-            sig = [0x00, 0xdd, 0x80, 0x20, 0xc0, 0x04, 0x00, 0x0c]
-            ofs = FindPattern(self.data, sig) + 6
+        ofs, _ = self.resolve(KERS_VARIANTS)
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('MOVS R0, #0')[0])
+        post = self.asm('MOVS R0, #0')
         self.data[ofs:ofs+2] = post
-        return [("no_kers", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("no_kers", ofs, pre, post)]
 
+    @signatures(*AUTOBRAKE_VARIANTS)
     def remove_autobrake(self):
         '''
         Creator/Author: BotoX
         '''
-        reg = 12
-        try:
-            sig = [None, 0x68, 0x42, 0xf6, 0x6e, 0x0c]
-            ofs = FindPattern(self.data, sig) + 2
-        except SignatureException:
-            # 022
-            sig = [0x2C, 0xE0, 0x18, 0x68, 0x42, 0xF6, 0xD0, 0x7b]
-            ofs = FindPattern(self.data, sig) + 4
-            reg = 11
-        post = bytes(self.ks.asm(f'MOVW R{reg}, #0xffff')[0])
+        ofs, reg = self.resolve(AUTOBRAKE_VARIANTS)
+        post = self.asm(f'MOVW R{reg}, #0xffff')
         pre = self.data[ofs:ofs+4]
         self.data[ofs:ofs+4] = post
-        return [("no_autobrake", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("no_autobrake", ofs, pre, post)]
 
+    @signatures(SIG_CHARGING)
     def remove_charging_mode(self):
         '''
         Creator/Author: BotoX
         '''
-        sig = [0xF8, 0x12, 0x00, 0x20, 0xB1, None, 0xF8, 0x3A, None, None, 0x7b]
-        ofs = FindPattern(self.data, sig) + 3
+        sig = SIG_CHARGING
+        ofs = self.find(sig) + 3
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('NOP')[0])
+        post = self.asm('NOP')
         self.data[ofs:ofs+2] = post
-        return [("no_charge", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("no_charge", ofs, pre, post)]
 
+    @signatures(*CRC_VARIANTS)
     def current_raising_coeff(self, coeff):
         '''
         Creator/Author: SH
         '''
         ret = []
 
-        # TODO: all trying to find same position
-        reg = 0
-        try:
-            sig = [0x95, 0xf8, 0x34, None, None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
-            ofs = FindPattern(self.data, sig) + 6
-        except SignatureException:
-            try:
-                # 242
-                sig = [0x85, 0xf8, 0x40, 0x60, 0x95, 0xf8, 0x34, 0x30]
-                ofs = FindPattern(self.data, sig) + 0x8
-                reg = 2
-            except SignatureException:
-                try:
-                    # 016
-                    sig = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
-                    ofs = FindPattern(self.data, sig) + 0xa
-                    reg = 1
-                except SignatureException:
-                    # 022
-                    sig = [0x95, 0xf8, 0x34, 0xc0, 0x4f, 0xf4, 0x96, 0x73]
-                    ofs = FindPattern(self.data, sig) + 4
-                    reg = 3
+        ofs, reg = self.resolve(CRC_VARIANTS)
 
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('MOVW R{}, #{}'.format(reg, coeff))[0])
+        post = self.asm('MOVW R{}, #{}'.format(reg, coeff))
         self.data[ofs:ofs+4] = post
-        ret.append(["crc", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("crc", ofs, pre, post))
         return ret
 
+    @signatures(*SL_DRIVE_VARIANTS)
     def speed_limit_drive(self, kmh):
         '''
         Creator/Author: BotoX
@@ -154,35 +315,16 @@ class MiPatcher(BasePatcher):
         ret = []
 
         # TODO: first two trying to find same position
-        try:
-            sig = [0x95, 0xf8, 0x34, None, None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
-            ofs = FindPattern(self.data, sig) + 4
-            reg = 1
-        except SignatureException:
-            try:
-                # 016
-                sig = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
-                ofs = FindPattern(self.data, sig) + 0x8
-                reg = 2
-            except SignatureException:
-                try:
-                    # 242
-                    sig = [0xa1, 0x85, 0x0f, 0x20, 0x20, 0x84]
-                    ofs = FindPattern(self.data, sig) + 2
-                    reg = 0
-                except SignatureException:
-                    # 022
-                    sig = [0x59, 0x00, 0x14, 0x22, 0x46]
-                    ofs = FindPattern(self.data, sig) + 2
-                    reg = 2
+        ofs, reg = self.resolve(SL_DRIVE_VARIANTS)
 
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('MOVS R{}, #{}'.format(reg, kmh))[0])
+        post = self.asm('MOVS R{}, #{}'.format(reg, kmh))
         self.data[ofs:ofs+2] = post
-        ret.append(["sl_drive", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("sl_drive", ofs, pre, post))
 
         return ret
 
+    @signatures(*SL_SPORT_VARIANTS)
     def speed_limit_sport(self, kmh):
         '''
         Creator/Author: SH
@@ -190,36 +332,17 @@ class MiPatcher(BasePatcher):
         ret = []
 
         # TODO: all trying to find same position
-        reg = 8
-        try:
-            # for 319 this moved to the top and 'movs' became 'mov.w'
-            sig = [0x95, 0xf8, 0x34, None, None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
-            ofs = FindPattern(self.data, sig) + 0xe
-        except SignatureException:
-            try:
-                # 242
-                sig = [0x85, 0xf8, 0x40, 0x60, 0x95, 0xf8, 0x34, 0x30]
-                ofs = FindPattern(self.data, sig) + 0xc
-                reg = 12
-            except SignatureException:
-                try:
-                    # 016
-                    sig = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
-                    ofs = FindPattern(self.data, sig) + 0x12
-                except SignatureException:
-                    # 022
-                    sig = [0x4f, 0xf0, 0x19, 0x0e, 0x4f, 0xf0, 0x05, 0x09]
-                    ofs = FindPattern(self.data, sig)
-                    reg = 14
+        ofs, reg = self.resolve(SL_SPORT_VARIANTS)
 
         pre = self.data[ofs:ofs+4]
         assert pre[-1] == reg
-        post = bytes(self.ks.asm('MOVW R{}, #{}'.format(reg, kmh))[0])
+        post = self.asm('MOVW R{}, #{}'.format(reg, kmh))
         self.data[ofs:ofs+4] = post
-        ret.append(["sl_speed", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("sl_speed", ofs, pre, post))
 
         return ret
 
+    @signatures(*SL_PED_VARIANTS)
     def speed_limit_ped(self, kmh):
         '''
         Creator/Author: Turbojeet
@@ -228,100 +351,83 @@ class MiPatcher(BasePatcher):
         ret = []
 
         # TODO: both trying to find same position
-        try:
-            sig = [0x4f, 0xf0, 0x05, None, 0x01, None, 0x02, 0xd1]
-            ofs = FindPattern(self.data, sig)
-        except SignatureException:
-            try:
-                # 016
-                sig = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
-                ofs = FindPattern(self.data, sig) + 0x16
-            except SignatureException:
-                # 0x22
-                sig = [0x4f, 0xf0, 0x05, 0x09, 0xbc, 0xf1, 0x01, 0x0f]
-                ofs = FindPattern(self.data, sig)
+        ofs, _ = self.resolve(SL_PED_VARIANTS)
 
         pre = self.data[ofs:ofs+4]
         reg = pre[-1]
-        post = bytes(self.ks.asm('MOVW R{}, #{}'.format(reg, kmh))[0])
+        post = self.asm('MOVW R{}, #{}'.format(reg, kmh))
         self.data[ofs:ofs+4] = post
-        ret.append(["sl_ped", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("sl_ped", ofs, pre, post))
 
         return ret
 
+    @signatures(*MSS_VARIANTS)
     def motor_start_speed(self, kmh):
         '''
         Creator/Author: BotoX
         '''
-        try:
-            sig = [0x01, 0x68, 0x40, 0xF2, 0xBD, 0x62]
-            ofs = FindPattern(self.data, sig) + 2
+        ofs, reg = self.resolve(MSS_VARIANTS)
+        if reg is None:
             val = struct.pack('<H', round(kmh * 345))
             pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-        except SignatureException:
-            # 022
-            sig = [0x01, 0x08, 0xb1, 0xf5, 0xff, 0x6f]
-            ofs = FindPattern(self.data, sig) + 2
+        else:
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm("CMP.W R1, #{}".format(round(kmh*408)))[0])
+            post = self.asm("CMP.W R{}, #{}".format(reg, round(kmh*408)))
             self.data[ofs:ofs+4] = post
-        return [("mss", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("mss", ofs, pre, post)]
 
+    @signatures(*WSC_VARIANTS)
     def wheel_speed_const(self, factor):
         '''
         Creator/Author: BotoX
         '''
         ret = []
 
-        try:
-            sig = [0xB4, 0xF9, None, 0x00, 0x40, 0xF2, 0x59, 0x11, 0x48, 0x43]
-            ofs = FindPattern(self.data, sig) + 4
-
+        ofs, drv = self.resolve(WSC_VARIANTS)
+        if drv is None:
             val1 = struct.pack('<H', round(345/factor))
             val2 = struct.pack('<H', round(1387*factor))
 
-            pre, post = PatchImm(self.data, ofs, 4, val1, MOVW_T3_IMM)
-            ret.append(["wheel_speed_const_0", hex(ofs), pre.hex(), post.hex()])
+            patches = [("wheel_speed_const_0", ofs, val1)]
 
             ofs -= 0x18
             pre = self.data[ofs+2:ofs+4]
             if pre[0] == 0x59 and pre[1] == 0x11:  # not in 247
-                pre, post = PatchImm(self.data, ofs, 4, val1, MOVW_T3_IMM)
-                ret.append(["wheel_speed_const_1", hex(ofs), pre.hex(), post.hex()])
+                patches.append(("wheel_speed_const_1", ofs, val1))
 
-            sig = [0x60, 0x60, 0x60, 0x68, 0x40, 0xF2, 0x6B, 0x51, 0x48, 0x43]
-            ofs = FindPattern(self.data, sig) + 4
-            pre, post = PatchImm(self.data, ofs, 4, val2, MOVW_T3_IMM)
-            ret.append(["wheel_other_const", hex(ofs), pre.hex(), post.hex()])
-        except SignatureException:
-            # 022
-            sig = [0xA4, 0xF8, 0x4A, 0x50, 0x6F, 0xF4, 0xCC, 0x70]
-            ofs = FindPattern(self.data, sig) + 4
+            sig = SIG_WSC_OTHER
+            ofs = self.find(sig) + 4
+            patches.append(("wheel_other_const", ofs, val2))
 
+            res = PatchImms(self.data, [(ofs, val, MOVW_T3_IMM) for _, ofs, val in patches])
+            for (name, ofs, _), (pre, post) in zip(patches, res):
+                ret.append(PatchRecord(name, ofs, pre, post))
+        else:
             val1 = int(round(408/factor))
-            # TODO: val1 can be incompatible with MVN instruction
+            assert ModImm(val1) is not None, f"{val1} is not encodable as MVN immediate"
             val2 = int(round(1774*factor))
 
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm(f'MVN R0,#{val1}')[0])
+            post = self.asm(f'MVN R0,#{val1}')
             self.data[ofs:ofs+4] = post
-            ret.append(['wheel_speed_const_0', hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord('wheel_speed_const_0', ofs, pre, post))
 
-            sig = [0xBD, 0xF9, 0x24, 0x50, 0x40, 0xF2, 0xEE, 0x66]
-            ofs = FindPattern(self.data, sig) + 4
+            sig = SIG_WSC_OTHER_022_0
+            ofs = self.find(sig) + 4
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm(f'MOVW R6,#{val2}')[0])
+            post = self.asm(f'MOVW R6,#{val2}')
             self.data[ofs:ofs+4] = post
-            ret.append(["wheel_other_const_0", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("wheel_other_const_0", ofs, pre, post))
 
-            sig = [0xBD, 0xF9, 0x24, 0x60, 0x40, 0xF2, 0xEE, 0x67]
-            ofs = FindPattern(self.data, sig) + 4
+            sig = SIG_WSC_OTHER_022_1
+            ofs = self.find(sig) + 4
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm(f"MOVW R7,#{val2}")[0])
-            ret.append(["wheel_other_const_1", hex(ofs), pre.hex(), post.hex()])
+            post = self.asm(f"MOVW R7,#{val2}")
+            ret.append(PatchRecord("wheel_other_const_1", ofs, pre, post))
 
         return ret
 
+    @signatures(*AMP_SPORT_NOP_VARIANTS, *AMP_SPORT_VARIANTS)
     def ampere_sport(self, amps, force=True):
         '''
         Creator/Author: SH
@@ -331,52 +437,21 @@ class MiPatcher(BasePatcher):
         val = struct.pack('<H', amps)
 
         if force:
-            try:
-                sig = [0x13, 0xD2, None, 0x85, None, 0xE0, None, 0x8E]
-                ofs = FindPattern(self.data, sig) + 8
-            except SignatureException:
-                try:
-                    # 242
-                    sig = [0x88, 0x42, 0x01, 0xd2, 0xa0, 0x85, 0x00, 0xe0]
-                    ofs = FindPattern(self.data, sig)
-                except SignatureException:
-                    try:
-                        # 016
-                        sig = [0x98, 0x42, 0x01, 0xd2, 0xe0, 0x85, 0x00, 0xe0]
-                        ofs = FindPattern(self.data, sig)
-                    except SignatureException:
-                        # 022
-                        sig = [0x60, 0x86, 0x2d, 0xe0, 0x58, 0x45, 0x01, 0xd2]
-                        ofs = FindPattern(self.data, sig) + 4
+            ofs, _ = self.resolve(AMP_SPORT_NOP_VARIANTS)
 
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('CMP R0, R0')[0])
+            post = self.asm('CMP R0, R0')
             self.data[ofs:ofs+2] = post
-            ret.append(["amp_speed_nop", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("amp_speed_nop", ofs, pre, post))
 
-        try:
-            sig = [None, 0x21, 0x4f, 0xf4, 0x96, 0x70]
-            ofs = FindPattern(self.data, sig) + 6
-        except SignatureException:
-            try:
-                # 242
-                sig = [0x85, 0xf8, 0x40, 0x60, 0x95, 0xf8, 0x34, 0x30]
-                ofs = FindPattern(self.data, sig) + 0x10
-            except SignatureException:
-                try:
-                    # 016
-                    sig = [0x00, 0xe0, 0x2e, 0x72, 0x95, 0xf8, 0x34, 0xc0]
-                    ofs = FindPattern(self.data, sig) + 0xe
-                except SignatureException:
-                    # 022
-                    sig = [0x59, 0x00, None, 0x22, 0x46, 0xf2, 0x84, 0x7b]
-                    ofs = FindPattern(self.data, sig) + 4
+        ofs, _ = self.resolve(AMP_SPORT_VARIANTS)
 
         pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-        ret.append(["amp_speed", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("amp_speed", ofs, pre, post))
 
         return ret
 
+    @signatures(*AMP_DRIVE_VARIANTS)
     def ampere_drive(self, amps, force=True):
         '''
         Creator/Author: BotoX
@@ -385,33 +460,23 @@ class MiPatcher(BasePatcher):
 
         val = struct.pack('<H', amps)
 
-        try:
-            sig = [0x95, 0xf8, 0x40, None, 0x01, None, 0x06, 0xd0, None, 0x8e]
-            ofs = FindPattern(self.data, sig) + 0xa
+        ofs, kind = self.resolve(AMP_DRIVE_VARIANTS)
+        if kind == 'nop':
+            ofs_f = ofs
+        else:
             pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-            ret.append(["amp_drive", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("amp_drive", ofs, pre, post))
             ofs_f = ofs + 4
-        except SignatureException:
-            try:
-                # 016
-                sig = [0x95, 0xf8, 0x40, 0xc0, 0xbc, 0xf1, 0x01, 0x0f, 0x05, 0xd0]
-                ofs = FindPattern(self.data, sig) + len(sig)
-                pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-                ret.append(["amp_drive", hex(ofs), pre.hex(), post.hex()])
-                ofs_f = ofs + 4
-            except SignatureException:
-                # 242: drive has same amps as speed
-                sig = [0x88, 0x42, 0x09, 0xd2, 0xa0, 0x85, 0x08, 0xe0]
-                ofs_f = FindPattern(self.data, sig)
 
         if force:
             pre = self.data[ofs_f:ofs_f+2]
-            post = bytes(self.ks.asm('CMP R0, R0')[0])
+            post = self.asm('CMP R0, R0')
             self.data[ofs_f:ofs_f+2] = post
-            ret.append(["amp_drive_nop", hex(ofs_f), pre.hex(), post.hex()])
+            ret.append(PatchRecord("amp_drive_nop", ofs_f, pre, post))
 
         return ret
 
+    @signatures(SIG_AMP_PED)
     def ampere_ped(self, amps, force=False):
         '''
         Creator/Author: Turbojeet
@@ -421,127 +486,93 @@ class MiPatcher(BasePatcher):
 
         val = struct.pack('<H', amps)
 
-        sig = [None, None, 0x41, 0xf6, 0x58, None, None, None, 0x01, 0xd2]
-        ofs = FindPattern(self.data, sig) + 2
+        sig = SIG_AMP_PED
+        ofs = self.find(sig) + 2
 
         pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-        ret.append(["amp_ped", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("amp_ped", ofs, pre, post))
 
         if force:
             ofs += 4
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('CMP R0, R0')[0])
+            post = self.asm('CMP R0, R0')
             self.data[ofs:ofs+2] = post
-            ret.append(["amp_ped_nop", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("amp_ped_nop", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_AMP_MAX_PED, *AMP_MAX_VARIANTS)
     def ampere_max(self, amps_ped=None, amps_drive=None, amps_sport=None):
         '''
         Creator/Author: BotoX/SH
         '''
         ret = []
 
-        sig = [0xa4, 0xf8, None, None, 0x4f, 0xf4, 0xfa]
-        ofs_p = FindPattern(self.data, sig) + 4
-
-        reg = 0
-        try:
-            sig = [0x02, 0xd0, 0xa4, 0xf8, 0x22, 0x80, None, 0xe0, 0x61, 0x84, None, 0xe0]
-            ofs = FindPattern(self.data, sig)
+        sig = SIG_AMP_MAX_PED
+        ofs_p = self.find(sig) + 4
 
+        ofs, drv = self.resolve(AMP_MAX_VARIANTS)
+        reg = reg_s = 0
+        ofs_d = None
+        if drv is None:
             b = self.data[ofs_p+3]
             if b == 0x52:  # 247
-                reg = 2
+                reg = reg_s = 2
                 ofs_s = ofs - 6
-                ofs_d = ofs + len(sig) + 6
+                ofs_d = ofs + len(SIG_AMP_MAX) + 6
             elif b == 0x53:  # 319
-                reg = 3
+                reg = reg_s = 3
                 ofs_s = ofs - 8
-                ofs_d = ofs + len(sig) + 8
+                ofs_d = ofs + len(SIG_AMP_MAX) + 8
             else:
                 raise Exception(f"invalid firmware file: {hex(b)}")
+        elif drv == '242':
+            # drive has the same current as sport
+            ofs_s, reg_s = ofs, 3
+        else:
+            ofs_d = ofs
+            ofs_s = self.find(AMP_MAX_SPORT[drv]) + 4
+
+        if amps_ped is not None:
+            #pre, post = PatchImm(self.data, ofs, 4, val_ped, MOVW_T3_IMM)
+            pre = self.data[ofs_p:ofs_p+4]
+            post = self.asm('MOVW R{},#{}'.format(reg, amps_ped))
+            self.data[ofs_p:ofs_p+4] = post
+            ret.append(PatchRecord("amp_max_ped", ofs_p, pre, post))
+
+        if amps_drive is not None and ofs_d is not None:
+            #pre, post = PatchImm(self.data, ofs, 4, val_drive, MOVW_T3_IMM)
+            pre = self.data[ofs_d:ofs_d+4]
+            reg_d = 12 if drv is not None and pre[-1] == 12 else reg
+            post = self.asm('MOVW R{},#{}'.format(reg_d, amps_drive))
+            self.data[ofs_d:ofs_d+4] = post
+            ret.append(PatchRecord("amp_max_drive", ofs_d, pre, post))
 
-            if amps_ped is not None:
-                #pre, post = PatchImm(self.data, ofs, 4, val_ped, MOVW_T3_IMM)
-                pre = self.data[ofs_p:ofs_p+4]
-                post = bytes(self.ks.asm('MOVW R{},#{}'.format(reg, amps_ped))[0])
-                self.data[ofs_p:ofs_p+4] = post
-                ret.append(["amp_max_ped", hex(ofs_p), pre.hex(), post.hex()])
-
-            if amps_drive is not None:
-                #pre, post = PatchImm(self.data, ofs, 4, val_drive, MOVW_T3_IMM)
-                pre = self.data[ofs_d:ofs_d+4]
-                post = bytes(self.ks.asm('MOVW R{},#{}'.format(reg, amps_drive))[0])
-                self.data[ofs_d:ofs_d+4] = post
-                ret.append(["amp_max_drive", hex(ofs_d), pre.hex(), post.hex()])
-        except SignatureException:
-            # 242 / 016
-            if amps_ped is not None:
-                pre = self.data[ofs_p:ofs_p+4]
-                post = bytes(self.ks.asm('MOVW R{},#{}'.format(reg, amps_ped))[0])
-                self.data[ofs_p:ofs_p+4] = post
-                ret.append(["amp_max_ped", hex(ofs_p), pre.hex(), post.hex()])
-
-            try:
-                # 242
-                sig = [0x95, 0xf8, 0x34, 0x80, 0x4f, 0xf4, 0xfa, 0x43]
-                ofs_s = FindPattern(self.data, sig) + 4
-                reg = 3  # TODO: cleanup
-            except SignatureException:
-                try:
-                    # 016
-                    sig = [0x95, 0xf8, 0x43, 0xc0, 0x46, 0xf6, 0x60, 0x50]
-                    ofs_d = FindPattern(self.data, sig) + 4
-
-                    sig = [0x95, 0xf8, 0x43, 0xc0, 0x4d, 0xf2, 0xd8, 0x60]
-                    ofs_s = FindPattern(self.data, sig) + 4
-                except SignatureException:
-                    # 022
-                    sig = [0x95, 0xf8, 0x41, 0x00, 0x48, 0xf6, 0xb8, 0x0c]
-                    ofs_d = FindPattern(self.data, sig) + 4
-
-                    sig = [0x95, 0xf8, 0x41, 0x30, 0x4d, 0xf2, 0xd8, 0x60]
-                    ofs_s = FindPattern(self.data, sig) + 4
-
-                if amps_drive is not None:
-                    pre = self.data[ofs_d:ofs_d+4]
-                    reg_d = reg
-                    if pre[-1] == 12:
-                        reg_d = 12
-                    post = bytes(self.ks.asm('MOVW R{},#{}'.format(reg_d, amps_drive))[0])
-                    self.data[ofs_d:ofs_d+4] = post
-                    ret.append(["amp_max_drive", hex(ofs_d), pre.hex(), post.hex()])
         if amps_sport is not None:
             #pre, post = PatchImm(self.data, ofs, 4, val_speed, MOVW_T3_IMM)
             pre = self.data[ofs_s:ofs_s+4]
-            post = bytes(self.ks.asm('MOVW R{},#{}'.format(reg, amps_sport))[0])
+            post = self.asm('MOVW R{},#{}'.format(reg_s, amps_sport))
             self.data[ofs_s:ofs_s+4] = post
-            ret.append(["amp_max_speed", hex(ofs_s), pre.hex(), post.hex()])
+            ret.append(PatchRecord("amp_max_speed", ofs_s, pre, post))
 
         return ret
 
+    @signatures(*DPC_VARIANTS, SIG_DPC_RESET)
     def dpc(self):
         '''
         Creator/Author: SH
         '''
         ret = []
-        try:
-            sig = [0x00, 0x21, 0xa1, 0x71, 0xa2, 0xf8, 0xec, 0x10, 0x63, 0x79]
-            ofs = FindPattern(self.data, sig) + 4
-        except SignatureException:
-            # 022
-            sig = [0xdf, 0xf8, 0x28, 0x91, 0xa9, 0xf8, 0xec, 0x70, 0x69, 0x79]
-            ofs = FindPattern(self.data, sig) + 4
+        ofs, _ = self.resolve(DPC_VARIANTS)
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('NOP')[0])
+        post = self.asm('NOP')
         self.data[ofs:ofs+2] = post
         self.data[ofs+2:ofs+4] = post
         post = self.data[ofs:ofs+4]
-        ret.append(["dpc_nop", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("dpc_nop", ofs, pre, post))
 
-        sig = [0xf8, 0xe2, None, None, 0xf8, 0xf0, None, None, 0xf8, 0xee, None]
-        ofs = FindPattern(self.data, sig) + 3
+        sig = SIG_DPC_RESET
+        ofs = self.find(sig) + 3
 
         b = self.data[ofs+3]
         reg = 0
@@ -564,12 +595,13 @@ class MiPatcher(BasePatcher):
             raise Exception(f"Invalid firmware file: {hex(b)}")
 
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('STRH.W R{}, [R{}, #0xEC]'.format(reg, reg2))[0])
+        post = self.asm('STRH.W R{}, [R{}, #0xEC]'.format(reg, reg2))
         self.data[ofs:ofs+4] = post
-        ret.append(["dpc_reset", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("dpc_reset", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_SHUTDOWN)
     def shutdown_time(self, seconds):
         '''
         Creator/Author: Turbojeet
@@ -577,13 +609,14 @@ class MiPatcher(BasePatcher):
         '''
         delay = int(seconds * 200)
         assert delay.bit_length() <= 12, 'bit length overflow'
-        sig = [0xb0, 0xf5, 0xfa, 0x7f, 0x08, 0xd9, None, 0x79, 0x30, 0xb9]
-        ofs = FindPattern(self.data, sig)
+        sig = SIG_SHUTDOWN
+        ofs = self.find(sig)
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('CMP.W R0, #{:n}'.format(delay))[0])
+        post = self.asm('CMP.W R0, #{:n}'.format(delay))
         self.data[ofs:ofs+4] = post
-        return [("shutdown", hex(ofs), pre.hex(), post.hex())]
+        return [PatchRecord("shutdown", ofs, pre, post)]
 
+    @signatures(SIG_PNB, SIG_PNB2)
     def ped_noblink(self):
         '''
         Creator/Author: Turbojeet
@@ -591,28 +624,29 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        sig = [0x01, 0x29, None, 0xd0, 0xa1, 0x79, None, 0x29, None, 0xd0, 0x90, 0xf8, 0x34, 0x10, None, 0x29]
-        ofs = FindPattern(self.data, sig) + len(sig)
+        sig = SIG_PNB
+        ofs = self.find(sig) + len(sig)
 
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('NOP')[0])
+        post = self.asm('NOP')
         self.data[ofs:ofs+2] = post
-        ret.append(["pnb", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("pnb", ofs, pre, post))
 
         try:
             #ofs += 30
-            sig = [0x89, 0x07, 0x02, 0xd5, 0x90, 0xf8, None, 0x10, 0x19, 0xb3, 0x90, 0xf8, 0x34, 0x00, 0x01, 0x28]
-            ofs = FindPattern(self.data, sig) + len(sig)
+            sig = SIG_PNB2
+            ofs = self.find(sig) + len(sig)
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('NOP')[0])
+            post = self.asm('NOP')
             self.data[ofs:ofs+2] = post
-            ret.append(["pnb2", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("pnb2", ofs, pre, post))
         except SignatureException:
             # n/a on lite
             pass
 
         return ret
 
+    @signatures(SIG_BLM_THROTTLE, SIG_BLM_GLOB)
     def brake_light_static(self):
         '''
         Creator/Author: SH
@@ -620,28 +654,29 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        sig = [0x01, 0x29, None, 0xd0, 0xa1, 0x79, 0x01, 0x29]
-        ofs = FindPattern(self.data, sig) + 6
+        sig = SIG_BLM_THROTTLE
+        ofs = self.find(sig) + 6
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('CMP R1, #0xff')[0])
+        post = self.asm('CMP R1, #0xff')
         self.data[ofs:ofs+2] = post
-        ret.append(["blm_throttle", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("blm_throttle", ofs, pre, post))
 
         ofs += 8
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('CMP R1, #0xff')[0])
+        post = self.asm('CMP R1, #0xff')
         self.data[ofs:ofs+2] = post
-        ret.append(["blm_ped", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("blm_ped", ofs, pre, post))
 
-        sig = [0x90, 0xf8, None, None, 0x00, 0x28, None, 0xd1]
-        ofs = FindPattern(self.data, sig) + 4
+        sig = SIG_BLM_GLOB
+        ofs = self.find(sig) + 4
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm('CMP R0, #0xff')[0])
+        post = self.asm('CMP R0, #0xff')
         self.data[ofs:ofs+2] = post
-        ret.append(["blm_glob", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("blm_glob", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_BLM_ADDR_1, SIG_BLM_ADDR_2, SIG_BLM, SIG_BLM_242)
     def brake_light(self):
         '''
         Creator/Author: Turbojeet
@@ -650,13 +685,13 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        sig = [0x10, 0xbd, 0x00, 0x00, None, 0x04, 0x00, 0x20, 0x70, 0xb5]
-        ofs = FindPattern(self.data, sig) + 4
+        sig = SIG_BLM_ADDR_1
+        ofs = self.find(sig, region='any') + 4
         ofs_1 = self.data[ofs:ofs+4]
         ofs_1 = struct.unpack("<L", ofs_1)[0]
 
-        sig = [None, 0x00, 0x00, 0x20, None, 0x06, 0x00, 0x20, None, 0x03, 0x00, 0x20]
-        ofs = FindPattern(self.data, sig) + 0x8
+        sig = SIG_BLM_ADDR_2
+        ofs = self.find(sig, region='any') + 0x8
         ofs_2 = self.data[ofs:ofs+4]
         ofs_2 = struct.unpack("<L", ofs_2)[0]
         adds = ofs_1 - ofs_2
@@ -664,21 +699,21 @@ class MiPatcher(BasePatcher):
         ofs = 0
         len_ = 46
         try:
-            sig = [0x90, 0xf8, None, None, None, 0x28, None, 0xd1]
-            ofs = FindPattern(self.data, sig) + 0x8
+            sig = SIG_BLM
+            ofs = self.find(sig) + 0x8
         except SignatureException:
             pass
 
         if not (ofs > 0 and ofs < 0x1000):
             # 242 / 245
-            sig = [0xa0, 0x7d, 0x40, 0x1c, 0xc0, 0xb2, 0xa0, 0x75]
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_BLM_242
+            ofs = self.find(sig)
 
         # smash stuff
         pre = self.data[ofs:ofs+len_]
         nopcount = ((len_ - 4) // 2)
-        post = bytes(self.ks.asm('NOP')[0] * nopcount
-                     + self.ks.asm('POP.W {R4, R5, R6, PC}')[0])
+        post = bytes(self.asm('NOP') * nopcount
+                     + self.asm('POP.W {R4, R5, R6, PC}'))
         assert len(post) == len_, len(post)
         self.data[ofs:ofs+len_] = post
 
@@ -696,12 +731,13 @@ class MiPatcher(BasePatcher):
         strh       r1,[r5,#0]
         """.format(adds)
 
-        patch = bytes(self.ks.asm(asm)[0])
+        patch = self.asm(asm)
         self.data[ofs:ofs+len(patch)] = patch
         post = self.data[ofs:ofs+len_]
-        ret.append(["blm", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("blm", ofs, pre, post))
         return ret
 
+    @signatures(*RFM_VARIANTS)
     def region_free(self):
         '''
         Creator/Author: Turbojeet
@@ -709,83 +745,81 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        try:
-            sig = self.ks.asm('STRB.W R2,[R1,#0x43]')[0]
-            ofs = FindPattern(self.data, sig)
+        ofs, drv = self.resolve(RFM_VARIANTS)
+        if drv is None:
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm('NOP')[0])
+            post = self.asm('NOP')
             self.data[ofs:ofs+2] = post
             self.data[ofs+2:ofs+4] = post
             post = self.data[ofs:ofs+4]
-            ret.append(["rfm1", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("rfm1", ofs, pre, post))
 
             # 248 / 321 (unused in 016)
-            sig = self.ks.asm('STRB R2,[R1,#0x1e]')[0]
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_RFM_2
+            ofs = self.find(sig)
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('NOP')[0])
+            post = self.asm('NOP')
             self.data[ofs:ofs+2] = post
             post = self.data[ofs:ofs+2]
-            ret.append(["rfm2", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("rfm2", ofs, pre, post))
 
             # 016 (unused in 248 / 321)
-            sig = self.ks.asm('STRB.W R2,[R1,#0x41]')[0]
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_RFM_3
+            ofs = self.find(sig)
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm('NOP')[0])
+            post = self.asm('NOP')
             self.data[ofs:ofs+2] = post
             self.data[ofs+2:ofs+4] = post
             post = self.data[ofs:ofs+4]
-            ret.append(["rfm3", hex(ofs), pre.hex(), post.hex()])
-        except SignatureException:
-            # 022
-            flag_offsets = [0x3e, 0x41, 0x43, 0x44, 0x45]
-            for i, f_ofs in enumerate(flag_offsets):
-                sig = self.ks.asm(f"STRB.W R7,[R6,#{f_ofs}]")[0]
-                ofs = FindPattern(self.data, sig)
+            ret.append(PatchRecord("rfm3", ofs, pre, post))
+        else:
+            for i, sig in enumerate(SIG_RFM_FLAGS_022):
+                ofs = self.find(sig)
                 pre = self.data[ofs:ofs+4]
-                post = bytes(self.ks.asm('NOP.W')[0])
+                post = self.asm('NOP.W')
                 self.data[ofs:ofs+4] = post
                 post = self.data[ofs:ofs+4]
-                ret.append([f"rfm_{i}", hex(ofs), pre.hex(), post.hex()])
+                ret.append(PatchRecord(f"rfm_{i}", ofs, pre, post))
 
             # set CC on
-            sig = self.ks.asm("STRH.W r8,[r5,#0xee]")[0]
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_RFM_CC_022
+            ofs = self.find(sig)
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm('STRH.W r7,[r5,#0xf8]')[0])
+            post = self.asm('STRH.W r7,[r5,#0xf8]')
             self.data[ofs:ofs+4] = post
-            ret.append(["rfm_cc", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("rfm_cc", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_LOWER_LIGHT)
     def lower_light(self):
         '''
         Creator/Author: Turbojeet
         Description: Lowers light intensity, for auto-light effect
         '''
         ret = []
-        sig = [0x4f, 0xf0, 0x80, 0x40, 0x04, 0xf0, None, None, 0x20, 0x88]
-        ofs = FindPattern(self.data, sig) + 0xa
+        sig = SIG_LOWER_LIGHT
+        ofs = self.find(sig) + 0xa
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm("adds r0,#1")[0])
+        post = self.asm("adds r0,#1")
         self.data[ofs:ofs+2] = post
-        ret.append(["lower_light_step", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("lower_light_step", ofs, pre, post))
 
         ofs += 6
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm("cmp r0,#5")[0])
+        post = self.asm("cmp r0,#5")
         self.data[ofs:ofs+2] = post
-        ret.append(["lower_light_cmp", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("lower_light_cmp", ofs, pre, post))
 
         ofs += 4
         pre = self.data[ofs:ofs+2]
-        post = bytes(self.ks.asm("movs r0,#5")[0])
+        post = self.asm("movs r0,#5")
         self.data[ofs:ofs+2] = post
-        ret.append(["lower_light_max", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("lower_light_max", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_AMPERE_METER)
     def ampere_meter(self, shift=8):
         '''
         Creator/Author: Turbojeet
@@ -806,15 +840,16 @@ class MiPatcher(BasePatcher):
             0xa8: [0x9c, 5, -0x10],  # 319
         }
 
-        sig = [None, 0x79, None, 0x49, 0x10, 0xb9, 0xfd, 0xf7, None, None, 0x48, 0x70]
-        ofs = FindPattern(self.data, sig)
+        sig = SIG_AMPERE_METER
+        ofs = self.find(sig)
         pre = self.data[ofs:ofs+0xa]
-        post = bytes(self.ks.asm(asm.format(*addr_table[pre[0]], shift))[0])
+        post = self.asm(asm.format(*addr_table[pre[0]], shift))
         self.data[ofs:ofs+0xa] = post
-        ret.append(["ampere_meter", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("ampere_meter", ofs, pre, post))
 
         return ret
 
+    @signatures(*CC_DELAY_VARIANTS)
     def cc_delay(self, seconds):
         '''
         Creator/Author: BotoX
@@ -823,22 +858,15 @@ class MiPatcher(BasePatcher):
 
         delay = int(seconds * 200)
 
-        reg = 0
-        try:
-            sig = [0xb0, 0xf8, 0xf8, 0x10, None, 0x4b, 0x4f, 0xf4, 0x7a, 0x70]
-            ofs = FindPattern(self.data, sig) + 6
-        except SignatureException:
-            # 022
-            sig = [0xf8, 0x00, 0x89, 0x46, 0x60, 0x4b, 0x4f, 0xf4, 0x7a, 0x71]
-            ofs = FindPattern(self.data, sig) + 6
-            reg = 1
+        ofs, reg = self.resolve(CC_DELAY_VARIANTS)
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('MOV.W R{},#{}'.format(reg, delay))[0])
+        post = self.asm('MOV.W R{},#{}'.format(reg, delay))
         self.data[ofs:ofs+4] = post
-        ret.append(["cc_delay", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("cc_delay", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_LEVER_RES)
     def lever_resolution(self, brake=0x73):
         '''
         Creator/Author: BotoX
@@ -846,24 +874,24 @@ class MiPatcher(BasePatcher):
         ret = []
 
         if brake != 0x73:
-            sig = bytes.fromhex("732800dd7320")
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_LEVER_RES
+            ofs = self.find(sig)
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('cmp r0,#{}'.format(brake))[0])
+            post = self.asm('cmp r0,#{}'.format(brake))
             self.data[ofs:ofs+2] = post
-            ret.append(["lever_res_brake1", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("lever_res_brake1", ofs, pre, post))
 
             ofs += 4
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('movs r0,#{}'.format(brake))[0])
+            post = self.asm('movs r0,#{}'.format(brake))
             self.data[ofs:ofs+2] = post
-            ret.append(["lever_res_brake2", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("lever_res_brake2", ofs, pre, post))
 
             ofs += 8
             pre = self.data[ofs:ofs+2]
-            post = bytes(self.ks.asm('movs r2,#{}'.format(brake))[0])
+            post = self.asm('movs r2,#{}'.format(brake))
             self.data[ofs:ofs+2] = post
-            ret.append(["lever_res_brake3", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("lever_res_brake3", ofs, pre, post))
 
         return ret
 
@@ -872,41 +900,32 @@ class MiPatcher(BasePatcher):
         # 321: 0x3cc0 -> NOP
         pass
 
+    @signatures(*BAUDRATE_VARIANTS)
     def bms_baudrate(self, val):
         '''
         Creator/Author: BotoX
         '''
         ret = []
-        try:
-            sig = [0x00, 0xf0, 0xe6, 0xf8, 0x00, 0x21, 0x4f, 0xf4, 0xe1, 0x30]
-            ofs = FindPattern(self.data, sig) + 6
-        except:
-            # 022
-            sig = [0x20, 0x46, 0x00, 0xf0, 0xa6, 0xfa, 0x4f, 0xf4, 0xe1, 0x30]
-            ofs = FindPattern(self.data, sig) + 6
+        ofs, _ = self.resolve(BAUDRATE_VARIANTS)
         pre = self.data[ofs:ofs+4]
-        post = bytes(self.ks.asm('MOV.W R0,#{}'.format(val))[0])
+        post = self.asm('MOV.W R0,#{}'.format(val))
         self.data[ofs:ofs+4] = post
-        ret.append(["bms_baudrate", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("bms_baudrate", ofs, pre, post))
         return ret
 
+    @signatures(*VOLT_LIMIT_VARIANTS)
     def volt_limit(self, volts):
         '''
         Creator/Author: BotoX
         '''
         ret = []
         val = struct.pack('<H', int(volts * 100) - 2600)
-        try:
-            sig = [0x40, 0xF2, 0xA5, 0x61, 0xA0, 0xF6, 0x28, 0x20, 0x88, 0x42]
-            ofs = FindPattern(self.data, sig)
-        except SignatureException:
-            # 022
-            sig = [0x40, 0xf2, 0xa5, 0x61, 0x88, 0x42, 0x04, 0xd3, 0x18, 0x20]
-            ofs = FindPattern(self.data, sig)
+        ofs, _ = self.resolve(VOLT_LIMIT_VARIANTS)
         pre, post = PatchImm(self.data, ofs, 4, val, MOVW_T3_IMM)
-        ret.append(["volt_limit", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("volt_limit", ofs, pre, post))
         return ret
 
+    @signatures(SIG_BTS_DAT, SIG_BTS_LIGHT, SIG_BTS_MODE)
     def button_swap(self):
         '''
         Creator/Author: Turbojeet
@@ -914,19 +933,14 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        sig = [None, 0x00, 0x00, 0x20, 0x10, 0xb5, 0x00, 0x23, 0x1a, 0x46, 0x03, 0xe0]
-        ofs_dat = FindPattern(self.data, sig)
+        sig = SIG_BTS_DAT
+        ofs_dat = self.find(sig, region='any')
 
-        sig = [0x22, 0x71, 0x22, 0x81, 0xb8, 0x78, 0x10, 0xb1, 0xba, 0x70, 0x2a, 0x72,
-               0x37, 0xe0, 0x64, 0x20, 0xb8, 0x70, 0x2e, 0x72, 0x33, 0xe0]
-        ofs_light = FindPattern(self.data, sig)
+        sig = SIG_BTS_LIGHT
+        ofs_light = self.find(sig)
 
-        sig = [0x22, 0x71, 0x22, 0x81, 0x01, 0x78, 0x21, 0xb1, 0x01, 0x29, 0x07, 0xd0,
-               0x02, 0x29, 0x10, 0xd1, 0x0a, 0xe0, 0x02, 0x21, 0x01, 0x70, 0x85, 0xf8,
-               0x3d, 0x60, 0x02, 0xe0, 0x02, 0x70, 0x85, 0xf8, 0x3d, 0x20, 0x85, 0xf8,
-               0x3c, 0x20, 0x04, 0xe0, 0x06, 0x70, 0x85, 0xf8, 0x3d, 0x20, 0x85, 0xf8,
-               0x3c, 0x60, 0x22, 0x70, 0xe2, 0x80]
-        ofs_mode = FindPattern(self.data, sig) - 2
+        sig = SIG_BTS_MODE
+        ofs_mode = self.find(sig) - 2
 
         diff = ofs_mode - ofs_light
         fofs = diff + 2
@@ -988,8 +1002,8 @@ class MiPatcher(BasePatcher):
              strb       r2,[r4,#0x0]
          EXIT2:
         """
-        post_light = bytes(self.ks.asm(asm_light)[0])
-        post_mode = bytes(self.ks.asm(asm_mode)[0])
+        post_light = self.asm(asm_light)
+        post_mode = self.asm(asm_mode)
         assert len(post_light) == 22
         assert len(post_mode) == 54
 
@@ -999,19 +1013,20 @@ class MiPatcher(BasePatcher):
         self.data[ofs_light:ofs_light+len(post_light)] = post_light
         self.data[ofs_mode:ofs_mode+len(post_mode)] = post_mode
 
-        ret.append(["bts_light", hex(ofs_light), pre_light.hex(), post_light.hex()])
-        ret.append(["bts_mode", hex(ofs_mode), pre_mode.hex(), post_mode.hex()])
+        ret.append(PatchRecord("bts_light", ofs_light, pre_light, post_light))
+        ret.append(PatchRecord("bts_mode", ofs_mode, pre_mode, post_mode))
 
         return ret
 
+    @signatures(SIG_FAKE_UID)
     def fake_uid(self, uid):
         '''
         Creator/Author: Turbojeet
         Description: Fake MCU UID
         '''
         ret = []
-        sig = [0xfd, 0xf7, None, None, None, 0x48, 0xb0, 0xf9, 0x00, 0x10, 0xb4, 0xf9, 0xb4, 0x21, 0x91, 0x42]
-        ofs = FindPattern(self.data, sig)
+        sig = SIG_FAKE_UID
+        ofs = self.find(sig)
 
         asm = """
             ldr             r0,[pc, #0x244]
@@ -1040,7 +1055,7 @@ class MiPatcher(BasePatcher):
             nop
         """
 
-        post = bytearray(self.ks.asm(asm)[0])
+        post = bytearray(self.asm(asm))
         pre = self.data[ofs:ofs+len(post)]
 
         # postfix
@@ -1050,10 +1065,11 @@ class MiPatcher(BasePatcher):
         post[-2-12:-2] = bytes.fromhex(uid)  # inject uid
 
         self.data[ofs:ofs+len(post)] = post
-        ret.append(["fud", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("fud", ofs, pre, post))
 
         return ret
 
+    @signatures(SIG_ABR, *ABR_MIN_VARIANTS)
     def ampere_brake(self, min_=None, max_=None):
         '''
         Creator/Author: SH
@@ -1061,31 +1077,27 @@ class MiPatcher(BasePatcher):
         '''
 
         ret = []
-        sig = [0x00, 0xdd, 0x73, 0x20, None, None, None, None, 0x50, 0x43, 0x73, 0x22, 0x90, 0xfb, 0xf2, 0xf0, None, None, 0x10, 0x1a]
+        sig = SIG_ABR
 
-        ofs = FindPattern(self.data, sig) + 4
+        ofs = self.find(sig) + 4
         if max_ is not None:
             pre = self.data[ofs:ofs+4]
-            post = bytes(self.ks.asm('MOVW R2,#{}'.format(max_))[0])
+            post = self.asm('MOVW R2,#{}'.format(max_))
             self.data[ofs:ofs+4] = post
-            ret.append(["abr_max", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("abr_max", ofs, pre, post))
 
         if min_ is not None:
-            try:
-                # 022
-                sig = [0xf2, 0xf0, None, None, 0x10, 0x1a, 0xa0, 0xf5, 0xfa, 0x50]
-                ofs = FindPattern(self.data, sig) + 6
-            except SignatureException:
-                ofs += 18
+            ofs, _ = self.resolve(ABR_MIN_VARIANTS)
             pre = self.data[ofs:ofs+4]
             val = NearestConst(min_)
             assert abs(val-min_) < 100, "rounding outside tolerance"
-            post = bytes(self.ks.asm('SUB.W R0,R0,#{}'.format(val))[0])
+            post = self.asm('SUB.W R0,R0,#{}'.format(val))
             self.data[ofs:ofs+4] = post
-            ret.append(["abr_min", hex(ofs), pre.hex(), post.hex()])
+            ret.append(PatchRecord("abr_min", ofs, pre, post))
 
         return ret
 
+    @signatures(*KERS_MULTI_VARIANTS)
     def kers_multi(self, l0=6, l1=12, l2=20):
         '''
         Creator/Author: Turbojeet
@@ -1093,7 +1105,8 @@ class MiPatcher(BasePatcher):
         '''
         ret = []
 
-        try:
+        ofs, drv = self.resolve(KERS_MULTI_VARIANTS)
+        if drv is None:
             asm = f"""
             nop
             nop
@@ -1107,10 +1120,8 @@ class MiPatcher(BasePatcher):
             MULT:
             muls  r0, r0, r1
             """
-            sig = [0x00, 0xeb, 0x40, 0x00, 0x40, 0x00, 0x05, 0xe0, 0x00, 0xeb, 0x40, 0x00, 0x01, 0xe0, 0x00, 0xeb, 0x80, 0x00, 0x80, 0x00]
-            ofs = FindPattern(self.data, sig)
-        except SignatureException:
-            # 022
+            sig = SIG_KERS_MULTI
+        else:
             asm = f"""
             nop.w
             nop.w
@@ -1126,13 +1137,12 @@ class MiPatcher(BasePatcher):
             muls  r0, r0, r1
             lsrs    r0, r0, #0xa
             """
-            sig = [0x00, 0xeb, 0x40, 0x00, 0xc0, 0xf3, 0x55, 0x20, 0x20, 0x86, 0x0a, 0xe0, 0x00, 0xeb, 0x40, 0x00, 0xc0, 0xf3, 0x15, 0x20, 0x20, 0x86, 0x04, 0xe0, 0x00, 0xeb, 0x80, 0x00, 0xc0, 0xf3, 0x15, 0x20]
-            ofs = FindPattern(self.data, sig)
+            sig = SIG_KERS_MULTI_022
 
         pre = self.data[ofs:ofs+len(sig)]
-        post = bytes(self.ks.asm(asm)[0])
+        post = self.asm(asm)
         assert len(pre) == len(post), f"{len(pre)}, {len(post)}"
         self.data[ofs:ofs+len(sig)] = post
-        ret.append(["kers_multi", hex(ofs), pre.hex(), post.hex()])
+        ret.append(PatchRecord("kers_multi", ofs, pre, post))
 
         return ret
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import util
+from base_patcher import BasePatcher
+from image import PatchedImage
+from util import FIND_BACKENDS, FindPattern, SelectBackend, SignatureException
+from test_multipattern import all_matches, random_signature
+
+
+def first_match(data, sig, mask=None, start=0):
+    return next((i for i in all_matches(data, sig, mask) if i >= start), None)
+
+
+@pytest.mark.parametrize('backend', [*FIND_BACKENDS, 'diff'])
+def test_backends_agree(backend):
+    rng = random.Random(5)
+    data = bytes(rng.choice(b'\x00\x01\x02\xff') for _ in range(2000))
+    for _ in range(200):
+        size = rng.randrange(2, 10)
+        ofs = rng.randrange(len(data) - size + 1)
+        sig = random_signature(rng, data, ofs, size)
+        mask = [rng.choice([0xff, 0xf0, 0x0f, 0x00]) for _ in sig] if rng.random() < 0.3 else None
+        start = rng.choice([0, rng.randrange(len(data))])
+
+        expected = first_match(data, sig, mask, start)
+        if expected is None:
+            with pytest.raises(SignatureException):
+                FindPattern(data, sig, mask=mask, start=start, backend=backend)
+        else:
+            assert FindPattern(data, sig, mask=mask, start=start, backend=backend) == expected
+
+
+@pytest.mark.parametrize('backend', [*FIND_BACKENDS, 'diff'])
+def test_match_at_end(backend):
+    data = bytes(range(64))
+    assert FindPattern(data, [61, None, 63], backend=backend) == 61
+    assert FindPattern(data, [63], backend=backend) == 63
+    assert FindPattern(data, [0x30, 0x3f], mask=[0, 0xff], backend=backend) == 62
+    assert FindPattern(data, list(data), backend=backend) == 0
+    with pytest.raises(SignatureException):
+        FindPattern(data, [62, 63, 0], backend=backend)
+
+
+@pytest.mark.parametrize('backend', [*FIND_BACKENDS, 'diff'])
+def test_maxit(backend):
+    data = bytes(range(64))
+    assert FindPattern(data, [10, 11], start=5, maxit=6, backend=backend) == 10
+    with pytest.raises(SignatureException):
+        FindPattern(data, [10, 11], start=5, maxit=5, backend=backend)
+    assert FindPattern(data, [62, 63], start=60, maxit=100, backend=backend) == 62
+
+
+
+def test_select_backend():
+    data = bytes(range(64))
+    assert SelectBackend(data, [1, 2]) == 'regex'
+    assert SelectBackend(memoryview(data), [1, 2]) == 'regex'
+    assert SelectBackend(PatchedImage(data), [1, 2]) == 'reference'
+    assert FindPattern(PatchedImage(data), [61, None, 63]) == 61
+
+
+def test_patcher_lookups_use_backends(monkeypatch):
+    monkeypatch.setattr(util, 'FIND_BACKEND', 'diff')
+    calls = []
+    monkeypatch.setitem(FIND_BACKENDS, 'reference', lambda *args: calls.append(args[1]) or util._find_reference(*args))
+
+    rng = random.Random(8)
+    data = bytes(rng.choice(b'\x00\x01\x02\xff') for _ in range(2000))
+    patcher = BasePatcher(data, 'dummy')
+    for _ in range(20):
+        sig = random_signature(rng, data, rng.randrange(len(data) - 8), 8)
+        assert patcher.find(sig, region='any') == first_match(data, sig)
+        assert tuple(sig) in calls
@@ -0,0 +1,90 @@
+import pytest
+
+from buffers import STATS
+from image import PatchedImage
+from util import PatchConflictException
+
+ORIGINAL = bytes(range(32))
+
+
+def test_reads_see_original_and_writes():
+    image = PatchedImage(ORIGINAL)
+    assert image.view() is ORIGINAL
+    image[4:6] = b'\xaa\xbb'
+    image[31] = 0xcc
+    assert image[3:7] == bytes([3, 0xaa, 0xbb, 6])
+    assert image[-1] == 0xcc
+    assert bytes(image) == ORIGINAL[:4] + b'\xaa\xbb' + ORIGINAL[6:31] + b'\xcc'
+    assert image.original == ORIGINAL
+    with pytest.raises(ValueError):
+        image[0:2] = b'\x00'
+
+
+def test_layers_are_isolated():
+    image = PatchedImage(ORIGINAL)
+    image.begin('a')
+    image[0:2] = b'\xaa\xaa'
+    image.begin('b')
+    assert image[0:2] == ORIGINAL[0:2]
+    image[8:10] = b'\xbb\xbb'
+    image.end()
+    assert bytes(image) == ORIGINAL
+
+
+def test_drop_rolls_back_layer():
+    image = PatchedImage(ORIGINAL)
+    image.begin('a')
+    image[0:2] = b'\xaa\xaa'
+    image.begin('b')
+    image[8:10] = b'\xbb\xbb'
+    image.drop('b')
+    image.commit()
+    assert bytes(image) == b'\xaa\xaa' + ORIGINAL[2:]
+    assert 'b' not in image.layers
+
+
+def test_commit_merges_layers():
+    image = PatchedImage(ORIGINAL)
+    image.begin('a')
+    image[0:2] = b'\xaa\xaa'
+    image[2:4] = b'\xab\xab'
+    image.begin('b')
+    image[10:12] = b'\xbb\xbb'
+    image.commit(['a'])
+    assert bytes(image) == b'\xaa\xaa\xab\xab' + ORIGINAL[4:]
+    assert image.diff() == [(0, ORIGINAL[0:4], b'\xaa\xaa\xab\xab')]
+    image.commit()
+    assert bytes(image)[10:12] == b'\xbb\xbb'
+
+
+def test_conflicting_layers():
+    image = PatchedImage(ORIGINAL)
+    image.begin('a')
+    image[4:8] = b'\xaa' * 4
+    image.begin('b')
+    with pytest.raises(PatchConflictException):
+        image[6:10] = b'\xbb' * 4
+    # the same bytes are no conflict
+    image[6:10] = b'\xaa\xaa' + ORIGINAL[8:10]
+    image.commit()
+    assert bytes(image)[4:10] == b'\xaa' * 4 + ORIGINAL[8:10]
+
+
+def test_writes_log_visible_changes():
+    image = PatchedImage(ORIGINAL)
+    image.begin('a')
+    image[4:6] = b'\xaa\xaa'
+    image.end()
+    image.begin('a')
+    assert image.writes == [(4, 6), (4, 6), (4, 6)]
+
+
+def test_render_overlapping_layers_once():
+    image = PatchedImage(ORIGINAL)
+    image[4:8] = b'\xaa' * 4
+    image[20:22] = b'\xcc' * 2
+    image.begin('b')
+    image[6:10] = b'\xbb' * 4
+    STATS.reset()
+    assert bytes(image) == ORIGINAL[:4] + b'\xaa\xaa' + b'\xbb' * 4 + ORIGINAL[10:20] + b'\xcc\xcc' + ORIGINAL[22:]
+    assert (STATS.copies, STATS.copied) == (1, len(ORIGINAL))
@@ -0,0 +1,56 @@
+import random
+
+from mi_patcher import MiPatcher
+from nb_patcher import NbPatcher
+from util import MatchAt, MultiPattern
+
+
+def all_matches(data, sig, mask=None):
+    return [i for i in range(len(data) - len(sig) + 1) if MatchAt(data, i, sig, mask)]
+
+
+def random_signature(rng, data, ofs, size):
+    sig = list(data[ofs:ofs + size])
+    for i in rng.sample(range(1, size), size // 4):
+        sig[i] = None
+    return sig
+
+
+def test_scan_matches_brute_force():
+    rng = random.Random(1)
+    # small alphabet so anchors repeat and overlap
+    data = bytes(rng.choice(b'\x00\x01\x02\xff') for _ in range(4000))
+    sigs = [random_signature(rng, data, rng.randrange(len(data) - 12), rng.randrange(4, 12)) for _ in range(40)]
+    sigs.append(random_signature(rng, data, len(data) - 8, 8))
+    sigs.append(list(data[-3:]))
+
+    found = MultiPattern(sigs).scan(data)
+    assert found == [all_matches(data, sig) for sig in sigs]
+
+
+def test_scan_masks_and_range():
+    rng = random.Random(2)
+    data = bytes(rng.randrange(256) for _ in range(3000))
+    sigs, masks = [], []
+    for _ in range(20):
+        ofs = rng.randrange(len(data) - 8)
+        sigs.append(list(data[ofs:ofs + 8]))
+        masks.append([0xff, 0xff, 0xff] + [rng.choice([0xff, 0xf0, 0x0f, 0x00]) for _ in range(5)])
+
+    found = MultiPattern(sigs, masks).scan(data, 100, 2900)
+    for sig, mask, offsets in zip(sigs, masks, found):
+        assert offsets == [i for i in all_matches(data, sig, mask) if 100 <= i and i + len(sig) <= 2900]
+
+
+def test_patcher_signatures():
+    rng = random.Random(3)
+    sigs = list({tuple(sig): sig for sig in MiPatcher.mod_signatures() + NbPatcher.mod_signatures()}.values())
+    data = bytearray(rng.randrange(256) for _ in range(0x8000))
+    for sig in rng.sample(sigs, 30):
+        ofs = rng.randrange(len(data) - len(sig))
+        data[ofs:ofs + len(sig)] = bytes(b or 0 for b in sig)
+    last = sigs[0]
+    data[-len(last):] = bytes(b or 0 for b in last)
+    data = bytes(data)
+
+    assert MultiPattern(sigs).scan(data) == [all_matches(data, sig) for sig in sigs]
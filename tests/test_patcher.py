@@ -0,0 +1,216 @@
+import random
+import struct
+
+import pytest
+
+import nb_patcher
+from base_patcher import BasePatcher
+from nb_patcher import NbPatcher
+from util import PatchConflictException, SignatureException
+from test_multipattern import all_matches, random_signature
+
+
+def first_match(data, sig, start=0):
+    return next((i for i in all_matches(data, sig) if i >= start), None)
+
+
+def test_find_follows_writes():
+    rng = random.Random(7)
+    data = bytes(rng.choice(b'\x00\x01\x02\xff') for _ in range(3000))
+    patcher = BasePatcher(data, 'dummy')
+    sigs = [random_signature(rng, data, rng.randrange(len(data) - 6), 6) for _ in range(20)]
+    patcher.scan(sigs)
+
+    for step in range(60):
+        layer = step % 3
+        patcher.data.begin(layer)
+        ofs = rng.randrange(len(data) - 4)
+        try:
+            patcher.data[ofs:ofs + 4] = bytes(rng.choice(b'\x00\x01\x02\xff') for _ in range(4))
+        except PatchConflictException:
+            pass
+        if step % 7 == 0:
+            patcher.data.drop(layer)
+        elif step % 5 == 0:
+            patcher.data.commit([layer])
+
+        current = bytes(patcher.data)
+        for sig in sigs + [list(current[-4:])]:
+            start = rng.randrange(len(data))
+            expected = first_match(current, sig, start)
+            if expected is None:
+                with pytest.raises(SignatureException):
+                    patcher.find(sig, start=start)
+            else:
+                assert patcher.find(sig, start=start) == expected
+
+
+def firmware_with_data_tail():
+    # vector table, code up to the POP {R4, PC} at 0x9000, the sport current table behind it
+    data = bytearray(0xa000)
+    data[0:16] = struct.pack('<LLLL', 0x20001000, 0x08000101, 0x08000101, 0xffffffff)
+    data[0x100:0x102] = b'\x10\xb5'
+    data[0x9000:0x9002] = b'\x10\xbd'
+    data[0x9800:0x980c] = bytes(nb_patcher.SIG_AMP_MAX_SPORT)
+    return bytes(data)
+
+
+def test_data_signatures_outside_code():
+    patcher = NbPatcher(firmware_with_data_tail(), 'f2')
+    assert patcher.layout.valid
+    assert patcher.region('code') == (12, 0x9004)
+    assert patcher.region('cc_delay') == (0x2000, 0x9004)
+
+    with pytest.raises(SignatureException):
+        patcher.find(nb_patcher.SIG_AMP_MAX_SPORT)
+    [record] = patcher.ampere_max_sport(30000)
+    assert record.ofs == 0x9800
+    assert patcher.data[0x9800:0x9804] == (30000).to_bytes(4, 'little')
+
+
+class TwoStepPatcher(BasePatcher):
+    def write(self, ofs, value):
+        pre = self.data[ofs:ofs + len(value)]
+        self.data[ofs:ofs + len(value)] = value
+        return pre
+
+    def broken(self, ofs):
+        self.write(ofs, b'\xee\xee')
+        raise SignatureException('Pattern not found!')
+
+
+def run_jobs(jobs, **kwargs):
+    patcher = TwoStepPatcher(bytes(16), 'dummy')
+    try:
+        res = patcher.run([(title, mod, args, {}) for title, mod, args in jobs], **kwargs)
+    except Exception as ex:
+        res = ex
+    return patcher, res
+
+
+def test_run_applies_all():
+    patcher, res = run_jobs([('a', 'write', (0, b'\x01\x01')), ('b', 'write', (2, b'\x02'))])
+    assert bytes(patcher.data) == b'\x01\x01\x02' + bytes(13)
+    assert [title for title, _ in res] == ['a', 'b']
+    assert [r['status'] for r in patcher.results] == ['applied', 'applied']
+
+
+def test_run_resolves_against_unmodified_image():
+    patcher, res = run_jobs([('a', 'write', (0, b'\x01\x01')), ('b', 'write', (0, b'\x01\x01'))])
+    assert [pre for _, pre in res] == [bytes(2), bytes(2)]
+    assert bytes(patcher.data)[:2] == b'\x01\x01'
+
+
+def test_run_rolls_back_on_failure():
+    patcher, res = run_jobs([('a', 'write', (0, b'\x01')), ('b', 'broken', (4,)), ('c', 'write', (8, b'\x03'))])
+    assert isinstance(res, SignatureException)
+    assert bytes(patcher.data) == bytes(16)
+    assert [(r['title'], r['status']) for r in patcher.results] == [('a', 'applied'), ('b', 'failed')]
+
+
+def test_run_best_effort_skips_failures():
+    jobs = [('a', 'write', (0, b'\x01')), ('b', 'broken', (4,)), ('c', 'write', (8, b'\x03')),
+            ('d', 'write', (0, b'\x04'))]
+    patcher, res = run_jobs(jobs, best_effort=True)
+    assert bytes(patcher.data) == b'\x01' + bytes(7) + b'\x03' + bytes(7)
+    assert [title for title, _ in res] == ['a', 'c']
+    assert [(r['title'], r['status']) for r in patcher.results] == \
+        [('a', 'applied'), ('b', 'skipped'), ('c', 'applied'), ('d', 'skipped')]
+    assert patcher.results[3]['reason'].startswith('PatchConflictException')
+
+
+def test_run_dry_run_keeps_image():
+    patcher, res = run_jobs([('a', 'write', (0, b'\x01')), ('b', 'write', (2, b'\x02'))], dry_run=True)
+    assert bytes(patcher.data) == bytes(16)
+    assert [r['status'] for r in patcher.results] == ['applied', 'applied']
+    assert not patcher.data.diff()
+
+
+def test_applicability_of_random_data():
+    report = NbPatcher(random.Random(8).randbytes(0x10000), 'f2').applicability()
+    assert report
+    for mod, entry in report.items():
+        assert entry['applicable'] in (False, None), mod
+        assert entry['reason'], mod
+    # neither patches anything on a f2
+    assert report['remove_kers'] == {'applicable': False, 'offsets': [], 'reason': 'no patch for f2'}
+    assert report['us_region_spoof'] == {'applicable': False, 'offsets': [], 'reason': 'nothing to patch'}
+
+
+SIG_A = [0x11, 0x22, 0x33, 0x44]
+SIG_B = [0x55, 0x66, 0x77, 0x88]
+
+
+class VariantPatcher(BasePatcher):
+    drv_signatures = {'b': [SIG_B]}
+    variants = [(SIG_A, 0, 'a'), (SIG_B, 0, 'b')]
+
+
+def variant_image():
+    data = bytearray(64)
+    data[8:12], data[32:36] = bytes(SIG_A), bytes(SIG_B)
+    return bytes(data)
+
+
+def test_resolve_orders_by_known_drv():
+    patcher = VariantPatcher(variant_image(), 'dummy', drv='b', drv_guess='b')
+    assert patcher.resolve(patcher.variants) == (32, 'b')
+    assert not patcher.drv_mismatches
+
+
+def test_resolve_only_checks_guessed_drv():
+    patcher = VariantPatcher(variant_image(), 'dummy', drv_guess='b')
+    assert patcher.resolve(patcher.variants) == (8, 'a')
+    assert patcher.drv_mismatches == ['0x8: default variant matched, DRV b was guessed']
+
+    patcher = VariantPatcher(variant_image(), 'dummy')
+    assert patcher.resolve(patcher.variants) == (8, 'a')
+    assert not patcher.drv_mismatches
+
+
+def test_resolve_needs_required_signatures():
+    import mi_patcher
+    from mi_patcher import MiPatcher
+
+    # 016 drive current without the 016 sport current, both of 022
+    data = bytearray(0x400)
+    place = {0x20: mi_patcher.SIG_AMP_MAX_PED, 0x100: mi_patcher.SIG_AMP_MAX_DRIVE_016,
+             0x200: mi_patcher.SIG_AMP_MAX_DRIVE_022, 0x300: mi_patcher.SIG_AMP_MAX_SPORT_022}
+    for ofs, sig in place.items():
+        data[ofs:ofs + len(sig)] = bytes(b or 0 for b in sig)
+
+    patcher = MiPatcher(bytes(data), '1s')
+    assert patcher.resolve(mi_patcher.AMP_MAX_VARIANTS) == (0x204, '022')
+    records = patcher.ampere_max(10000, 25000, 35000)
+    assert [(rec.name, rec.ofs) for rec in records] == \
+        [('amp_max_ped', 0x24), ('amp_max_drive', 0x204), ('amp_max_speed', 0x304)]
+
+
+def test_fingerprint_exact_match(tmp_path):
+    from fingerprint import Fingerprint, FingerprintDB
+
+    data = bytearray(random.Random(9).randbytes(0x2000))
+    data[0x400:0x410] = b'NineBotScooter\x00\x00'
+    db = FingerprintDB(tmp_path / 'fingerprints.db')
+    empty = db.digest()
+    db.add(bytes(data), 'nb', ['g2'], drv='1.2', name='stock')
+    assert db.digest() != empty
+
+    exact = Fingerprint(bytes(data), db)
+    assert (exact.drv, exact.source, exact.exact) == ('1.2', 'database', True)
+
+    # same image with another key in the id block
+    data[0x420:0x430] = bytes(16)
+    other = Fingerprint(bytes(data), db)
+    assert (other.drv, other.source, other.exact) == ('1.2', 'database', False)
+
+
+def test_run_does_not_render_image():
+    from buffers import STATS
+
+    STATS.reset()
+    patcher, _ = run_jobs([('a', 'write', (0, b'\x01')), ('b', 'write', (2, b'\x02')), ('c', 'write', (4, b'\x03'))])
+    patcher.find([0x01, None, 0x02])
+    assert STATS.copies == 0
+    bytes(patcher.data)
+    assert STATS.copies == 1
@@ -0,0 +1,59 @@
+import pytest
+
+import thumb
+from thumb import CONDITIONS, MOD_IMM_VALUES, Encode
+
+keystone = pytest.importorskip('keystone')
+KS = keystone.Ks(keystone.KS_ARCH_ARM, keystone.KS_MODE_THUMB)
+
+REGS = ['r0', 'r3', 'r7', 'r8', 'ip', 'r14', 'sp', 'pc']
+IMMS = [0, 1, 0x7f, 0xff, 0x100, 0x3e8, 0xfff, 0xffff, 0x10000, -1, -0x100,
+        *MOD_IMM_VALUES[::97], MOD_IMM_VALUES[-1]]
+
+
+def keystone_asm(src, addr):
+    try:
+        return bytes(KS.asm(src, addr)[0])
+    except keystone.KsError:
+        return None
+
+
+def forms():
+    yield 'nop', 0
+    yield 'NOP.W', 0
+    for r in REGS:
+        for imm in IMMS:
+            for mnem in ['movw', 'movs', 'movs.w', 'mov.w', 'cmp', 'cmp.w']:
+                yield f'{mnem} {r}, #{imm:#x}' if imm >= 0 else f'{mnem} {r}, #{imm}', 0
+        for r2 in REGS:
+            yield f'cmp {r}, {r2}', 0
+            for mnem in ['strb', 'ldrb', 'strh', 'ldrh', 'strb.w', 'ldrb.w', 'strh.w', 'ldrh.w']:
+                for ofs in [0, 1, 2, 31, 62, 64, 0xfe, 0xfff, 0x1000]:
+                    yield f'{mnem} {r},[{r2},#{ofs:#x}]', 0
+    for addr in [0, 0x1000, 0x8002]:
+        for rel in [-0x1000000, -0x800, -0x7fe, -0x100, -0x102, 0, 2, 0xfe, 0x100, 0x7fe, 0x800, 0xfffffe]:
+            target = addr + rel
+            if target < 0:
+                continue
+            yield f'b #{target:#x}', addr
+            for cond in CONDITIONS:
+                yield f'b{cond} {target:#x}', addr
+
+
+def test_encode_matches_keystone():
+    mismatches = []
+    for src, addr in forms():
+        ours = Encode(src, addr)
+        if ours is not None and ours != keystone_asm(src, addr):
+            mismatches.append((src, addr, ours.hex()))
+    assert not mismatches
+
+
+def test_encode_covers_forms():
+    encoded = {src.split()[0].lower() for src, addr in forms() if Encode(src, addr) is not None}
+    assert encoded >= {'nop', 'nop.w', 'movw', 'movs', 'movs.w', 'mov.w', 'cmp', 'cmp.w', 'b', 'beq',
+                       'strb', 'ldrb', 'strh', 'ldrh', 'strb.w', 'ldrb.w', 'strh.w', 'ldrh.w'}
+
+
+def test_selfcheck():
+    assert thumb._selfcheck(rounds=3000) > 0
@@ -0,0 +1,40 @@
+import hashlib
+import random
+import zipfile
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip('fasttea')
+from zippy import Zippy
+
+
+def buffered_zip(zippy, comment):
+    # the archive as written into one in-memory file
+    enc_data = zippy.encrypt()
+    md5, md5e = hashlib.md5(zippy.data).hexdigest(), hashlib.md5(enc_data).hexdigest()
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED, False) as zip_file:
+        zip_file.writestr('FIRM.bin', zippy.data)
+        zip_file.writestr('FIRM.bin.enc', enc_data)
+        zip_file.writestr('info.txt', 'dev: {};\nnam: {};\nenc: B;\ntyp: DRV;\nmd5: {};\nmd5e: {};\n'.format(
+            zippy.model, zippy.name, md5, md5e).encode())
+        zip_file.writestr('info.json', Zippy.get_v3(zippy.name, zippy.model, md5, md5e, True).encode())
+        zip_file.writestr('params.txt', zippy.params.encode())
+        zip_file.comment = comment
+    return buf.getvalue()
+
+
+def test_zip_stream_matches_buffered_archive():
+    zippy = Zippy(random.Random(10).randbytes(0xc000), params='DPC\n', model='pro2')
+    chunks = list(zippy.zip_stream(b'nice'))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == buffered_zip(zippy, b'nice')
+
+
+def test_zip_stream_has_no_data_descriptors():
+    zippy = Zippy(bytes(0x8000), params='DPC\n', model='pro2')
+    with zipfile.ZipFile(BytesIO(zippy.zip_it(b'nice'))) as zip_file:
+        assert zip_file.testzip() is None
+        assert [info.flag_bits & 0x08 for info in zip_file.infolist()] == [0] * 5
+        assert zip_file.read('FIRM.bin') == zippy.data
@@ -0,0 +1,274 @@
+import re
+import struct
+from bisect import bisect_left
+
+from util import PatchImm
+
+# https://web.eecs.umich.edu/~prabal/teaching/eecs373-f10/readings/ARMv7-M_ARM.pdf
+# bit scatter tables for PatchImm, one entry per instruction bit (MSB first)
+MOVW_T3_IMM = [*[None]*5, 11, *[None]*6, 15, 14, 13, 12, None, 10, 9, 8, *[None]*4, 7, 6, 5, 4, 3, 2, 1, 0]
+MOVS_T1_IMM = [*[None]*8, 7, 6, 5, 4, 3, 2, 1, 0]
+# i:imm3:imm8 of the 12 bit modified immediate (ThumbExpandImm)
+MOD_IMM = [*[None]*5, 11, *[None]*11, 10, 9, 8, *[None]*4, 7, 6, 5, 4, 3, 2, 1, 0]
+
+REGISTERS = {**{f'r{i}': i for i in range(16)}, 'ip': 12, 'sp': 13, 'lr': 14, 'pc': 15}
+CONDITIONS = ['eq', 'ne', 'cs', 'cc', 'mi', 'pl', 'vs', 'vc', 'hi', 'ls', 'ge', 'lt', 'gt', 'le']
+
+
+def ExpandImm(imm12):
+    '''
+    Value of a 12 bit modified immediate (ThumbExpandImm), None for unpredictable encodings.
+    '''
+    b = imm12 & 0xff
+    if imm12 >> 10 == 0:
+        form = (imm12 >> 8) & 3
+        if form and not b:
+            return None
+        return b * [1, 0x00010001, 0x01000100, 0x01010101][form]
+    rot, unrot = imm12 >> 7, 0x80 | (imm12 & 0x7f)
+    return ((unrot >> rot) | (unrot << (32 - rot))) & 0xffffffff
+
+
+# every encodable modified immediate, value -> imm12 (lowest encoding wins)
+MOD_IMM_ENCODING = {}
+for _imm12 in range(0x1000):
+    MOD_IMM_ENCODING.setdefault(ExpandImm(_imm12), _imm12)
+del MOD_IMM_ENCODING[None], _imm12
+MOD_IMM_VALUES = sorted(MOD_IMM_ENCODING)
+
+
+def ModImm(val):
+    '''
+    Return the 12 bit modified immediate encoding val, None if there is none.
+    '''
+    return MOD_IMM_ENCODING.get(val)
+
+
+def NearestConst(x):
+    '''
+    Nearest value encodable as modified immediate, the lower one on ties.
+    '''
+    i = bisect_left(MOD_IMM_VALUES, x)
+    cand = MOD_IMM_VALUES[max(i - 1, 0):i + 1]
+    return min(cand, key=lambda y: abs(y - x))
+
+
+def _narrow(hw):
+    return struct.pack('<H', hw)
+
+
+def _wide(hw1, hw2, imm=None, table=None):
+    buf = bytearray(struct.pack('<HH', hw1, hw2))
+    if table is not None:
+        PatchImm(buf, 0, 4, imm.to_bytes(4, 'little'), table)
+    return bytes(buf)
+
+
+def _reg(op):
+    return REGISTERS.get(op)
+
+
+def _imm(op):
+    # keystone only takes a sign behind '#'
+    if op.startswith('#'):
+        op = op[1:]
+    elif op[:1] in '+-':
+        return None
+    try:
+        return int(op.strip(), 0)
+    except ValueError:
+        return None
+
+
+def _mem(op):
+    # [rn] or [rn, #imm]
+    m = re.fullmatch(r'\[\s*(\w+)\s*(?:,\s*(#?[-\w]+)\s*)?\]', op)
+    if not m:
+        return None, None
+    if m.group(2) and '-' in m.group(2):
+        return None, None
+    return _reg(m.group(1)), _imm(m.group(2)) if m.group(2) else 0
+
+
+def _mov(mnem, ops):
+    if len(ops) != 2:
+        return None
+    rd, imm = _reg(ops[0]), _imm(ops[1])
+    if rd is None or imm is None or rd in (13, 15):
+        return None
+
+    if mnem == 'movw':
+        if 0 <= imm <= 0xffff:
+            return _wide(0xf240, rd << 8, imm, MOVW_T3_IMM)
+        return None
+
+    if mnem == 'movs' and rd < 8 and 0 <= imm <= 0xff:
+        return _narrow(0x2000 | rd << 8 | imm)
+
+    mod = ModImm(imm)
+    if mod is None:
+        return None
+    if mnem in ('movs', 'movs.w'):
+        return _wide(0xf05f, rd << 8, mod, MOD_IMM)
+    if mnem == 'mov.w':
+        return _wide(0xf04f, rd << 8, mod, MOD_IMM)
+    return None
+
+
+def _cmp(mnem, ops):
+    if len(ops) != 2:
+        return None
+    rn = _reg(ops[0])
+    if rn is None:
+        return None
+
+    rm = _reg(ops[1])
+    if rm is not None:
+        if mnem != 'cmp':
+            return None
+        if rn < 8 and rm < 8:
+            return _narrow(0x4280 | rm << 3 | rn)
+        return _narrow(0x4500 | (rn >> 3) << 7 | rm << 3 | (rn & 7))
+
+    imm = _imm(ops[1])
+    if imm is None or rn in (13, 15):
+        return None
+    if mnem == 'cmp' and rn < 8 and 0 <= imm <= 0xff:
+        return _narrow(0x2800 | rn << 8 | imm)
+    mod = ModImm(imm)
+    if mod is None:
+        return None
+    return _wide(0xf1b0 | rn, 0x0f00, mod, MOD_IMM)
+
+
+def _ldst(mnem, ops):
+    if len(ops) != 2:
+        return None
+    rt, (rn, imm) = _reg(ops[0]), _mem(ops[1])
+    if rt is None or rn is None or imm is None or rt in (13, 15):
+        return None
+
+    narrow = {'strb': (0x7000, 0), 'ldrb': (0x7800, 0), 'strh': (0x8000, 1), 'ldrh': (0x8800, 1)}
+    if mnem in narrow:
+        op, shift = narrow[mnem]
+        if rt < 8 and rn < 8 and 0 <= imm < 32 << shift and not imm & ((1 << shift) - 1):
+            return _narrow(op | (imm >> shift) << 6 | rn << 3 | rt)
+        return None
+
+    wide = {'strb.w': 0xf880, 'ldrb.w': 0xf890, 'strh.w': 0xf8a0, 'ldrh.w': 0xf8b0}
+    if mnem in wide and rn != 15 and 0 <= imm <= 0xfff:
+        return _wide(wide[mnem] | rn, rt << 12 | imm)
+    return None
+
+
+def _branch(mnem, ops, addr):
+    if len(ops) != 1:
+        return None
+    target = _imm(ops[0])
+    if target is None or target & 1:
+        return None
+    # the assembler picks the narrow form by target distance, not by branch offset
+    rel = target - addr
+    ofs = rel - 4
+
+    if mnem == 'b':
+        if -2048 <= rel <= 2046:
+            if ofs < -2048:
+                return None
+            return _narrow(0xe000 | (ofs >> 1) & 0x7ff)
+        if not -(1 << 24) <= ofs < (1 << 24):
+            return None
+        s = (ofs >> 24) & 1
+        j1 = ((ofs >> 23) & 1) ^ 1 ^ s
+        j2 = ((ofs >> 22) & 1) ^ 1 ^ s
+        return _wide(0xf000 | s << 10 | (ofs >> 12) & 0x3ff,
+                     0x9000 | j1 << 13 | j2 << 11 | (ofs >> 1) & 0x7ff)
+
+    cond = CONDITIONS.index(mnem[1:])
+    # far conditional branches are left to keystone
+    if -256 <= rel <= 254 and ofs >= -256:
+        return _narrow(0xd000 | cond << 8 | (ofs >> 1) & 0xff)
+    return None
+
+
+def Encode(src, addr=0):
+    '''
+    Encode a single Thumb-2 instruction from the subset the mods emit.
+    Returns None for anything else (multi line blocks, other instructions or encodings),
+    the output is byte identical to keystone for everything it does encode.
+    '''
+    src = src.strip().lower()
+    if not src or any(c in src for c in '\n;{'):
+        return None
+    mnem, _, rest = src.partition(' ')
+    ops = [op.strip() for op in re.split(r',(?![^\[]*\])', rest)] if rest.strip() else []
+
+    if mnem in ('nop', 'nop.w'):
+        if ops:
+            return None
+        return _narrow(0xbf00) if mnem == 'nop' else _wide(0xf3af, 0x8000)
+    if mnem in ('movw', 'movs', 'movs.w', 'mov.w'):
+        return _mov(mnem, ops)
+    if mnem in ('cmp', 'cmp.w'):
+        return _cmp(mnem, ops)
+    if mnem in ('strb', 'ldrb', 'strh', 'ldrh', 'strb.w', 'ldrb.w', 'strh.w', 'ldrh.w'):
+        return _ldst(mnem, ops)
+    if mnem == 'b' or (mnem[:1] == 'b' and mnem[1:] in CONDITIONS):
+        return _branch(mnem, ops, addr)
+    return None
+
+
+def _selfcheck(seed=0, rounds=20000):
+    # differential check against keystone
+    import random
+    import keystone
+
+    ks = keystone.Ks(keystone.KS_ARCH_ARM, keystone.KS_MODE_THUMB)
+    rnd = random.Random(seed)
+    regs = [f'r{i}' for i in range(16)] + ['sp', 'lr', 'pc', 'ip']
+
+    def imm():
+        return rnd.choice([
+            rnd.randrange(0x100), rnd.randrange(0x10000), rnd.randrange(1 << 32), -rnd.randrange(0x100),
+            rnd.randrange(0x100) << rnd.randrange(25), rnd.randrange(0x100) * rnd.choice([0x10001, 0x1000100, 0x1010101]),
+        ])
+
+    def fmt(val):
+        return rnd.choice(['#{}', '#{:#x}', '{}', '{:#x}']).format(val) if val >= 0 else f'#{val}'
+
+    def src():
+        r, r2 = rnd.choice(regs), rnd.choice(regs)
+        kind = rnd.randrange(8)
+        if kind == 0:
+            return rnd.choice(['nop', 'nop.w', 'NOP', 'NOP.W'])
+        if kind == 1:
+            return f"{rnd.choice(['movw', 'movs', 'mov.w', 'MOVW'])} {r},{fmt(imm())}"
+        if kind == 2:
+            return f"{rnd.choice(['cmp', 'cmp.w', 'CMP'])} {r}, {fmt(imm())}"
+        if kind == 3:
+            return f"cmp {r}, {r2}"
+        if kind == 4:
+            mnem = rnd.choice(['strb', 'ldrb', 'strh', 'ldrh', 'strb.w', 'ldrb.w', 'strh.w', 'STRH.W'])
+            return f"{mnem} {r},[{r2},#{rnd.choice([rnd.randrange(64), rnd.randrange(0x1100)]):#x}]"
+        target = rnd.choice([rnd.randrange(-600, 600), rnd.randrange(-5000, 5000), rnd.randrange(-(1 << 25), 1 << 25)])
+        if kind == 5:
+            return f"b {fmt(target) if target >= 0 else target}"
+        return f"b{rnd.choice(CONDITIONS)} {target:#x}"
+
+    checked = 0
+    for _ in range(rounds):
+        s, addr = src(), rnd.choice([0, 0, 0x1000, rnd.randrange(0, 0x10000, 2)])
+        ours = Encode(s, addr)
+        if ours is None:
+            continue
+        try:
+            ref = bytes(ks.asm(s, addr)[0])
+        except keystone.KsError:
+            ref = None
+        assert ours == ref, f'{s!r} @ {addr:#x}: {ours.hex()} != {ref.hex() if ref else ref}'
+        checked += 1
+    return checked
+
+
+if __name__ == '__main__':
+    print(f'{_selfcheck()} instructions match keystone')
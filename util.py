@@ -1,34 +1,47 @@
+import os
+import re
 import struct
+from collections import deque
+from functools import lru_cache
 
 
 class SignatureException(Exception):
     pass
 
 
+class PatchConflictException(Exception):
+    pass
+
+
+@lru_cache(maxsize=64)
+def _compile_imm(signature):
+    # per halfword: mask of the bits to keep and (shift, imm mask) pairs to scatter
+    halves = []
+    for i in range(0, len(signature), 16):
+        keep, shifts = 0xffff, {}
+        for j, imm_bitofs in enumerate(signature[i:i + 16][::-1]):
+            if imm_bitofs is None:
+                continue
+            keep &= ~(1 << j)
+            shifts[j - imm_bitofs] = shifts.get(j - imm_bitofs, 0) | (1 << imm_bitofs)
+        halves.append((keep, tuple(shifts.items())))
+    return '<' + 'H' * len(halves), tuple(halves)
+
+
 def PatchImm(data, ofs, size, imm, signature):
     assert size % 2 == 0, 'size must be power of 2!'
     assert len(signature) == size * 8, 'signature must be exactly size * 8 long!'
     imm = int.from_bytes(imm, 'little')
-    sfmt = '<' + 'H' * (size // 2)
+    sfmt, halves = _compile_imm(tuple(signature))
 
-    sigs = [signature[i:i + 16][::-1] for i in range(0, len(signature), 16)]
     orig = data[ofs:ofs+size]
     words = struct.unpack(sfmt, orig)
 
     patched = []
-    for i, word in enumerate(words):
-        for j in range(16):
-            imm_bitofs = sigs[i][j]
-            if imm_bitofs is None:
-                continue
-
-            imm_mask = 1 << imm_bitofs
-            word_mask = 1 << j
-
-            if imm & imm_mask:
-                word |= word_mask
-            else:
-                word &= ~word_mask
+    for word, (keep, shifts) in zip(words, halves):
+        word &= keep
+        for shift, imm_mask in shifts:
+            word |= (imm & imm_mask) << shift if shift >= 0 else (imm & imm_mask) >> -shift
         patched.append(word)
 
     packed = struct.pack(sfmt, *patched)
@@ -36,18 +49,17 @@ def PatchImm(data, ofs, size, imm, signature):
     return (orig, packed)
 
 
-def FindPattern(data, signature, mask=None, start=None, maxit=None):
-    sig_len = len(signature)
-    if start is None:
-        start = 0
-    stop = len(data) - len(signature)
-    if maxit is not None:
-        stop = start + maxit
+def PatchImms(data, patches):
+    '''
+    Apply a list of (ofs, imm, signature) immediate patches, returns their (orig, packed) pairs.
+    '''
+    return [PatchImm(data, ofs, len(signature) // 8, imm, signature) for ofs, imm, signature in patches]
 
+
+def _find_reference(data, signature, mask, start, stop):
+    sig_len = len(signature)
     if mask:
-        assert sig_len == len(mask), 'mask must be as long as the signature!'
-        for i in range(sig_len):
-            signature[i] &= mask[i]
+        signature = [b & m if b is not None else None for b, m in zip(signature, mask)]
 
     for i in range(start, stop):
         matches = 0
@@ -56,17 +68,205 @@ def FindPattern(data, signature, mask=None, start=None, maxit=None):
             matches += 1
             if matches == sig_len:
                 return i
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _compile_regex(signature, mask):
+    parts = []
+    for i, b in enumerate(signature):
+        m = mask[i] if mask else 0xFF
+        if b is None or m == 0:
+            parts.append(b'.')
+        elif m == 0xFF:
+            parts.append(re.escape(bytes([b])))
+        else:
+            parts.append(b'[' + b''.join(re.escape(bytes([v])) for v in range(256) if v & m == b & m) + b']')
+    return re.compile(b''.join(parts), re.DOTALL)
+
+
+def _find_regex(data, signature, mask, start, stop):
+    regex = _compile_regex(tuple(signature), tuple(mask) if mask else None)
+    match = regex.search(data, start, stop + len(signature) - 1)
+    return match.start() if match else None
+
+
+FIND_BACKENDS = {
+    'reference': _find_reference,
+    'regex': _find_regex,
+}
+
+# override for testing, 'diff' runs all backends the data allows and checks they agree
+FIND_BACKEND = os.environ.get('NGFW_FIND_BACKEND')
+
 
-    raise SignatureException('Pattern not found!')
+def SelectBackend(data, signature, mask=None):
+    '''
+    Backend for one lookup: regex runs in C but needs a bytes-like buffer, anything else
+    (e.g. a PatchedImage) goes through the reference loop.
+    '''
+    try:
+        memoryview(data)
+    except TypeError:
+        return 'reference'
+    return 'regex'
 
 
-def NearestConst(x):
-    n_dist, n_sign = 0xffff, 1
-    for s in range(32-8):
-        for i in range(0xff):
-            y = i << s
-            assert y <= 0xffffffff, "error while rounding"
-            dist, sign = abs(y - x), 1 if y - x >= 0 else -1
-            n_dist, n_sign = (dist, sign)\
-                if dist < n_dist else (n_dist, n_sign)
-    return x + n_sign * n_dist
+def FindPattern(data, signature, mask=None, start=None, maxit=None, backend=None):
+    backend = backend or FIND_BACKEND
+    sig_len = len(signature)
+    if start is None:
+        start = 0
+    # exclusive bound on the match offset, a match may end at the last byte
+    stop = len(data) - sig_len + 1
+    if maxit is not None:
+        stop = min(start + maxit, stop)
+
+    if mask:
+        assert sig_len == len(mask), 'mask must be as long as the signature!'
+
+    if backend == 'diff':
+        names = FIND_BACKENDS if SelectBackend(data, signature, mask) == 'regex' else ['reference']
+        found = {name: FIND_BACKENDS[name](data, signature, mask, start, stop) for name in names}
+        assert len(set(found.values())) == 1, f'backends disagree: {found}'
+        ofs = found['reference']
+    else:
+        ofs = FIND_BACKENDS[backend or SelectBackend(data, signature, mask)](data, signature, mask, start, stop)
+
+    if ofs is None:
+        raise SignatureException('Pattern not found!')
+    return ofs
+
+
+def FindAll(data, signature, mask=None, start=None, end=None, find=None):
+    '''
+    Lazily yield every match in [start, end) in one forward sweep.
+    The data is searched as it is when the next match is requested, so patching
+    a yielded match before resuming is fine.
+    '''
+    if find is None:
+        def find(sig, mask=None, start=None):
+            return FindPattern(data, sig, mask=mask, start=start)
+
+    ofs = (start or 0) - 1
+    while True:
+        try:
+            ofs = find(signature, mask=mask, start=ofs + 1)
+        except SignatureException:
+            return
+        if end is not None and ofs + len(signature) > end:
+            return
+        yield ofs
+
+
+def FindPairs(data, first, second, start=None, end=None, window=None, find=None):
+    '''
+    Yield (a, b) for every match a of first and the nearest match b of second after it.
+    Pairs with b more than window bytes behind a are skipped, the search for the next
+    first match resumes after b.
+    '''
+    pos, b = start or 0, -1
+    while True:
+        try:
+            a = next(FindAll(data, first, start=pos, end=end, find=find))
+            if b <= a:
+                b = next(FindAll(data, second, start=a + 1, end=end, find=find))
+        except StopIteration:
+            return
+        if window is not None and b - a > window:
+            pos = a + 1
+            continue
+        yield a, b
+        pos = b + 1
+
+
+def MatchAt(data, ofs, signature, mask=None):
+    if ofs < 0 or ofs + len(signature) > len(data):
+        return False
+    for i, b in enumerate(signature):
+        if b is None:
+            continue
+        m = mask[i] if mask else 0xFF
+        if data[ofs + i] & m != b & m:
+            return False
+    return True
+
+
+def _anchor(signature, mask=None):
+    # longest run of concrete (non-wildcard, unmasked) bytes
+    best_ofs, best_len = 0, 0
+    run = 0
+    for i, b in enumerate(signature):
+        if b is not None and (not mask or mask[i] == 0xFF):
+            run += 1
+            if run > best_len:
+                best_ofs, best_len = i - run + 1, run
+        else:
+            run = 0
+    return best_ofs, bytes(signature[best_ofs:best_ofs + best_len])
+
+
+class MultiPattern():
+    '''
+    Wildcard-aware Aho-Corasick matcher.
+    Every signature is reduced to its longest concrete byte run (anchor), all anchors
+    are matched in a single pass over the data and each anchor hit is verified against
+    the full signature including wildcards and masks.
+    '''
+    def __init__(self, signatures, masks=None):
+        self.signatures = [list(sig) for sig in signatures]
+        self.masks = list(masks) if masks else [None] * len(self.signatures)
+        assert len(self.masks) == len(self.signatures), 'one mask per signature!'
+
+        goto, out = [{}], [[]]
+        for k, (sig, mask) in enumerate(zip(self.signatures, self.masks)):
+            if mask:
+                assert len(sig) == len(mask), 'mask must be as long as the signature!'
+            anchor_ofs, anchor = _anchor(sig, mask)
+            assert anchor, 'signature needs at least one concrete byte!'
+            state = 0
+            for b in anchor:
+                if b not in goto[state]:
+                    goto[state][b] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = goto[state][b]
+            # distance from anchor end back to signature start
+            out[state].append((k, anchor_ofs + len(anchor) - 1))
+
+        # dense transition table, built breadth-first along the failure links
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = [goto[0].get(b, 0) for b in range(256)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row = list(delta[fail[state]])
+            for b, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]][b]
+                out[nxt] += out[fail[nxt]]
+                row[b] = nxt
+                queue.append(nxt)
+            delta[state] = row
+        self.delta = delta
+        self.out = [tuple(o) if o else None for o in out]
+
+    def scan(self, data, start=0, end=None):
+        '''Return a sorted list of match offsets for every signature.'''
+        if end is None:
+            end = len(data)
+        found = [[] for _ in self.signatures]
+        sigs, masks = self.signatures, self.masks
+        delta, out = self.delta, self.out
+
+        state = 0
+        for i, b in enumerate(data[start:end], start):
+            state = delta[state][b]
+            if out[state] is None:
+                continue
+            for k, dist in out[state]:
+                ofs = i - dist
+                sig = sigs[k]
+                if ofs >= start and ofs + len(sig) <= end and MatchAt(data, ofs, sig, masks[k]):
+                    found[k].append(ofs)
+        return found
@@ -28,6 +28,9 @@ import os
 from io import BytesIO
 import fasttea
 
+from buffers import Copy
+from layout import EncId, HeaderValid
+
 
 ROOTPATH = os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.realpath(__file__))))
@@ -35,33 +38,107 @@ ROOTPATH = os.path.dirname(os.path.dirname(
 FILENAME = "FIRM"
 EXT_IN = ".bin"
 EXT_OUT = ".zip"
+# plaintext the model id and header checks look at
+PROBE_LEN = 0x410
+
+
+def _decode_model(data):
+    id_ = None
+    try:
+        id_ = data[0x100:0x10f].decode('ascii')
+    except UnicodeDecodeError:
+        try:
+            id_ = data[0x400:0x40e].decode("ascii")
+        except UnicodeDecodeError:
+            pass
+    return id_
+
+
+class _ChunkSink():
+    # file for ZipFile that only holds what was not drained yet. Seeking back within it
+    # lets ZipFile fill in each local header itself, so no entry needs a data descriptor
+    # (flag bit 3), which not every flashing app reads.
+    def __init__(self):
+        self.buf = bytearray()
+        self.base = 0
+        self.pos = 0
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        pos += [0, self.pos, self.base + len(self.buf)][whence]
+        if pos < self.base:
+            raise OSError('cannot seek into drained data')
+        self.pos = pos
+        return pos
+
+    def write(self, data):
+        start = self.pos - self.base
+        self.buf[start:start + len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        '''Everything written up to the current position, only call it between entries.'''
+        size = self.pos - self.base
+        chunk = bytes(self.buf[:size])
+        del self.buf[:size]
+        self.base = self.pos
+        return [chunk] if chunk else []
+
+
+class Probe():
+    '''
+    What the first blocks of an image tell: whether it is encrypted, its model id
+    (see Zippy.decode_model), the ninebot encryption id and whether it starts with
+    a plausible vector table.
+    '''
+    def __init__(self, head, encrypted):
+        self.encrypted = encrypted
+        self.model = _decode_model(head)
+        self.enc_id = EncId(head)
+        self.header = HeaderValid(head)
+
+    @property
+    def readable(self):
+        return bool(self.model or self.enc_id or self.header)
 
 
 class Zippy():
     def __init__(self, data, params=None, model=None, name="ngfw"):
-        self.data = bytearray(data)
+        # the one buffer is passed on by reference, fasttea only takes bytes
+        self.data = data if isinstance(data, bytes) else Copy(data)
         self.name = name
 
         self.params = params
         self.model = model
 
     def decode_model(self):
-        id_ = None
-        try:
-            id_ = self.data[0x100:0x10f].decode('ascii')
-        except UnicodeDecodeError:
-            try:
-                id_ = self.data[0x400:0x40e].decode("ascii")
-            except UnicodeDecodeError:
-                pass
-        return id_
+        return _decode_model(self.data)
+
+    def probe(self, encrypted=None):
+        '''
+        Probe the image decrypting only its first blocks. With encrypted=None an image
+        without readable model id is taken as encrypted, like try_extract does.
+        '''
+        if encrypted is None:
+            encrypted = not self.decode_model()
+        head = bytes(self.data[:PROBE_LEN])
+        if encrypted:
+            # blocks chain from the start of the image, the 4 byte trailer is dropped
+            head = fasttea.decrypt(bytes(self.data[:(PROBE_LEN + 4 + 7) & ~7]))
+        return Probe(head, encrypted)
 
     def try_extract(self, decrypt=True):
-        """Extract the first file from a ZIP archive and return its content as bytes."""
+        """Extract the first file from a ZIP archive into data, return whether there was one."""
 
         file_ = BytesIO(self.data)
         if not zipfile.is_zipfile(file_):
-            return
+            return False
 
         with zipfile.ZipFile(file_, 'r') as zip_ref:
             # List all files and directories in the ZIP file
@@ -78,6 +155,7 @@ class Zippy():
                         id_ = self.decode_model()
                     except:
                         raise Exception("Decode error")
+        return True
 
     def encrypt(self, key=None):
         if key:
@@ -118,19 +196,24 @@ class Zippy():
         }
         return json.dumps(data)
 
-    def zip_it(self, comment, enforce=True, key=None):
+    def zip_stream(self, comment, enforce=True, key=None):
+        '''
+        The archive of zip_it as it is written, one entry at a time, without holding all of it.
+        '''
+        sink = _ChunkSink()
+        zip_file = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, False)
+
         md5 = hashlib.md5()
         md5.update(self.data)
-
-        zip_buffer = BytesIO()
-        zip_file = zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False)
-
         zip_file.writestr('FIRM.bin', self.data)
+        yield from sink.drain()
 
         enc_data = self.encrypt(key)
         zip_file.writestr('FIRM.bin.enc', enc_data)
         md5e = hashlib.md5()
         md5e.update(enc_data)
+        del enc_data
+        yield from sink.drain()
 
         info_txt = 'dev: {};\nnam: {};\nenc: B;\ntyp: DRV;\nmd5: {};\nmd5e: {};\n'.format(
             self.model, self.name, md5.hexdigest(), md5e.hexdigest())
@@ -144,12 +227,10 @@ class Zippy():
 
         zip_file.comment = comment
         zip_file.close()
-        zip_buffer.seek(0)
-        content = zip_buffer.getvalue()
-        zip_buffer.close()
-
-        return content
+        yield from sink.drain()
 
+    def zip_it(self, comment, enforce=True, key=None):
+        return b''.join(self.zip_stream(comment, enforce=enforce, key=key))
 
 if __name__ == "__main__":
     infile = None
@@ -173,4 +254,4 @@ if __name__ == "__main__":
     zippy.try_extract()
 
     with open(outfile, 'wb') as fp:
-        fp.write(zippy.zip_it("nice".encode(), offline=False, enforce=False))
+        fp.writelines(zippy.zip_stream("nice".encode(), enforce=False))